@@ -74,6 +74,23 @@ class caDNAno(QApplication):
                                   # itself to app.documentControllers
         return dc.document()
 
+class HeadlessApp(object):
+    """Stands in for caDNAno when the model is driven without any UI, for
+    instance by command line tools such as exportstaples.py. Install it
+    with useHeadlessApp() before creating model objects."""
+    def __init__(self):
+        self.v = None
+        self.ph = None
+        self.phg = None
+
+    def isInMaya(self):
+        return False
+
+def useHeadlessApp():
+    if not caDNAno.sharedApp:
+        caDNAno.sharedApp = HeadlessApp()
+    return caDNAno.sharedApp
+
 # Convenience. No reason to feel guilty using it - caDNAno is a singleton.
 def app(appArgs=None):
     if not caDNAno.sharedApp:
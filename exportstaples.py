@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# The MIT License
+#
+# Copyright (c) 2011 Wyss Institute at Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# http://www.opensource.org/licenses/mit-license.php
+
+"""
+exportstaples.py
+
+Writes the staple list of a caDNAno2 (.cn2) document as CSV without
+starting the UI:
+    python exportstaples.py design.cn2 [-s scaffold.txt] [-o staples.csv]
+"""
+
+import sys
+from optparse import OptionParser
+from cadnano import useHeadlessApp
+
+
+def main(argv):
+    parser = OptionParser(usage="%prog design.cn2 [options]")
+    parser.add_option("-s", "--scaffold", metavar="FILE",\
+                      help="apply the scaffold sequence in FILE first")
+    parser.add_option("-o", "--output", metavar="FILE",\
+                      help="write to FILE instead of stdout")
+    opts, args = parser.parse_args(argv[1:])
+    if len(args) != 1:
+        parser.error("expected a single .cn2 file")
+    useHeadlessApp()  # Before any model object exists
+    from model.binaryarchive import load
+    from model.stapleexport import writeStapleCSV
+    root = load(args[0])  # JSON or binary
+    # Documents are what the UI saves, but a bare part decodes too
+    parts = root.parts() if hasattr(root, 'parts') else [root]
+    if opts.scaffold:
+        sequence = ''.join(open(opts.scaffold).read().split())
+        for part in parts:
+            part.applySequence(sequence)
+    out = open(opts.output, 'wb') if opts.output else sys.stdout
+    try:
+        writeStapleCSV(parts, out)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -25,24 +25,50 @@
 base.py
 Created by Shawn Douglas on 2011-02-08.
 """
-from .enum import StrandType
 
 
 class Base(object):
     """
-    A POD class that lives in the private API of virtualhelix.
-    (Why not put it inside VirtualHelix? Because it's already quite crowded)
+    A lightweight view onto one position of a StrandArray that lives in the
+    private API of virtualhelix. Bases are created on demand (strand[i]) and
+    compare equal when they refer to the same helix, strand and index, so
+    they can be held onto (for instance by undo commands) and compared like
+    the standalone objects they used to be.
     Provides information about which bases are connected to which other bases.
     """
+    __slots__ = ('_vhelix', '_strandtype', '_n')
+
     def __init__(self, vhelix, strandtype, index):
-        super(Base, self).__init__()
-        self._5pBase = None
-        self._3pBase = None
-        self._colorName = None
         self._vhelix = vhelix
         self._strandtype = strandtype
         self._n = index
 
+    def __eq__(self, other):
+        if not isinstance(other, Base):
+            return NotImplemented
+        return self._n == other._n and\
+               self._vhelix is other._vhelix and\
+               self._strandtype == other._strandtype
+
+    def __ne__(self, other):
+        if not isinstance(other, Base):
+            return NotImplemented
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash((id(self._vhelix), self._strandtype, self._n))
+
+    def _strandArray(self):
+        return self._vhelix._strand(self._strandtype)
+
+    @property
+    def _5pBase(self):
+        return self._strandArray().get5pBase(self._n)
+
+    @property
+    def _3pBase(self):
+        return self._strandArray().get3pBase(self._n)
+
     def __str__(self):
         fiveTo3 = self._vhelix.directionOfStrandIs5to3(self._strandtype)
         if fiveTo3:
@@ -75,8 +101,8 @@ class Base(object):
                self._5pBase._n == self._n - nOffsetOf3:
                     fiveB = '<' if fiveTo3 else '>'
             else:
-                    fiveB = "%i:%i" % (self._3pBase.vhelixNum(),\
-                                       self._3pBase._n)
+                    fiveB = "%i:%i" % (self._5pBase.vhelixNum(),\
+                                       self._5pBase._n)
         if fiveTo3:
             return fiveB + ',' + threeB
         else:
@@ -86,38 +112,47 @@ class Base(object):
         # Resets self._{5,3}pBase according to str, which
         # is a string in the format of those returned by __str__
         fiveTo3 = self._vhelix.directionOfStrandIs5to3(self._strandtype)
-        if self._strandtype == StrandType.Staple:
-            oppositeST = StrandType.Scaffold
-        else:
-            oppositeST = StrandType.Staple
+        link5, link3 = Base.linksFromString(string, self._vhelix, self._n,\
+                                            fiveTo3)
+        strandArray = self._strandArray()
+        # Links are set one side at a time, so let the index catch up later
+        self._vhelix.oligoIndex().invalidate()
+        for link, setLink in ((link3, strandArray._setLink3),\
+                              (link5, strandArray._setLink5)):
+            if link == None:
+                setLink(self._n, None)
+            else:
+                vh, n = link
+                setLink(self._n, vh._strand(self._strandtype)[n])
+
+    @staticmethod
+    def linksFromString(string, vhelix, n, fiveTo3):
+        """The (link5, link3) that string, in the format returned by
+        __str__, gives base n of a strand of vhelix that goes 5' to 3' if
+        fiveTo3. Each link is (vhelix, index) or None."""
         direction3p = 1 if fiveTo3 else -1
-        strand = self._vhelix._strand(self._strandtype)
         l, r = string.split(',')
         fiveP, threeP = (l, r) if fiveTo3 else (r, l)
-        if threeP == '_':
-            self._3pBase = None
-        elif threeP == ('>' if fiveTo3 else '<'):
-            self._3pBase = strand[self._n + direction3p]
-        elif threeP == ('<' if fiveTo3 else '>'):
-            err = "Opposite directions on 3p of base '%s' in %s strand?!" %\
-                                       (string, "5->3" if fiveTo3 else "3->5")
-            raise ValueError(err)
-        else:
-            helixNum, baseNum = threeP.split(':')
-            remoteVH = self._vhelix.part().getVirtualHelix(int(helixNum))
-            self._3pBase = remoteVH._strand(oppositeST)[int(baseNum)]
-        if fiveP == '_':
-            self._5pBase = None
-        elif fiveP == ('<' if fiveTo3 else '>'):
-            self._5pBase = strand[self._n - direction3p]
-        elif fiveP == ('>' if fiveTo3 else '<'):
-            err = "Opposite directions on 5p of base '%s' in %s strand?!" %\
-                                       (string, "5->3" if fiveTo3 else "3->5")
-            raise ValueError(err)
-        else:
-            helixNum, baseNum = fiveP.split(':')
-            remoteVH = self._vhelix.part().getVirtualHelix(int(helixNum))
-            self._5pBase = remoteVH._strand(oppositeST)[int(baseNum)]
+        links = []
+        for end, toward, away, offset in\
+                ((fiveP, '<', '>', -direction3p),\
+                 (threeP, '>', '<', direction3p)):
+            if not fiveTo3:
+                toward, away = away, toward
+            if end == '_':
+                links.append(None)
+            elif end == toward:
+                links.append((vhelix, n + offset))
+            elif end == away:
+                err = "Opposite directions on %s of base '%s' in %s strand?!" %\
+                      ("5p" if offset == -direction3p else "3p", string,\
+                       "5->3" if fiveTo3 else "3->5")
+                raise ValueError(err)
+            else:
+                helixNum, baseNum = end.split(':')
+                remoteVH = vhelix.part().getVirtualHelix(int(helixNum))
+                links.append((remoteVH, int(baseNum)))
+        return tuple(links)
 
     def __repr__(self):
         if self._3pBase:
@@ -135,18 +170,30 @@ class Base(object):
         else:
             return str((b3, self._n, b5))
 
+    def _setLink5(self, toBase):
+        self._strandArray()._setLink5(self._n, toBase)
+
+    def _setLink3(self, toBase):
+        self._strandArray()._setLink3(self._n, toBase)
+
     def _set5Prime(self, toBase):
         """Only VirtualHelix should call this method. Returns l
         such that self._unset5Prime(toBase, *l) undoes this command."""
+        oligoIndex = self._vhelix.oligoIndex()
         fromOld5, toOld3 = self._5pBase, None
         if fromOld5:
-            fromOld5._3pBase = None
+            fromOld5._setLink3(None)
+            self._setLink5(None)
+            oligoIndex.unlink(fromOld5, self)
         if toBase:
             toOld3 = toBase._3pBase
-            toBase._3pBase = self
-        if toOld3:
-            toOld3._5pBase = None
-        self._5pBase = toBase
+            if toOld3:
+                toOld3._setLink5(None)
+                toBase._setLink3(None)
+                oligoIndex.unlink(toBase, toOld3)
+            toBase._setLink3(self)
+            self._setLink5(toBase)
+            oligoIndex.link(toBase, self)
         return (fromOld5, toOld3)
 
     def _unset5Prime(self, toBase, fromOld5, toOld3):
@@ -158,15 +205,21 @@ class Base(object):
     def _set3Prime(self, toBase):
         """Only VirtualHelix should call this method. Returns l
         such that self._unset5Prime(toBase, *l) undoes this command."""
+        oligoIndex = self._vhelix.oligoIndex()
         fromOld3, toOld5 = self._3pBase, None
         if fromOld3:
-            fromOld3._5pBase = None
+            fromOld3._setLink5(None)
+            self._setLink3(None)
+            oligoIndex.unlink(self, fromOld3)
         if toBase:
             toOld5 = toBase._5pBase
-            toBase._5pBase = self
-        if toOld5:
-            toOld5._3pBase = None
-        self._3pBase = toBase
+            if toOld5:
+                toOld5._setLink3(None)
+                toBase._setLink5(None)
+                oligoIndex.unlink(toOld5, toBase)
+            toBase._setLink5(self)
+            self._setLink3(toBase)
+            oligoIndex.link(self, toBase)
         return (fromOld3, toOld5)
 
     def _unset3Prime(self, toBase, fromOld3, toOld5):
@@ -188,62 +241,42 @@ class Base(object):
         return self._3pBase
 
     def setColor(self, colorName):
-        self._colorName = colorName
+        """Colors the whole oligo this base belongs to"""
+        self._strandArray().setColor(self._n, colorName)
 
     def getColor(self):
-        return self._colorName
+        return self._strandArray().color(self._n)
+
+    def oligo(self):
+        return self._vhelix.oligoIndex().oligoOf(self)
 
     def isEmpty(self):
-        return self._5pBase == None and \
-               self._3pBase == None
+        return self._strandArray().isEmpty(self._n)
 
     def is5primeEnd(self):
         """Return True if no 5pBase, but 3pBase exists."""
-        return self._5pBase == None and \
-               self._3pBase != None
+        return self._strandArray().is5primeEnd(self._n)
 
     def is3primeEnd(self):
         """Return True if no 3pBase, but 5pBase exists."""
-        return self._5pBase != None and \
-               self._3pBase == None
+        return self._strandArray().is3primeEnd(self._n)
 
     def isEnd(self):
-        return (self._5pBase == None) ^ (self._3pBase == None)
+        return self._strandArray().isEnd(self._n)
 
     def isStrand(self):
-        return self._5pBase != None and\
-               self._3pBase != None
+        return self._strandArray().isStrand(self._n)
 
     def partId(self):
         """docstring for partNum"""
         return self._vhelix.part().id()
 
     def isCrossover(self):
-        """Return True if the part id or vhelix number of the prev or
-        next base does not match the same for this base."""
-        if self.isEmpty():
-            return False
-        if self._5pBase != None:
-            if self.vhelixNum() != self._5pBase.vhelixNum():
-                return True
-            elif self.partId() != self._5pBase.partId():
-                return True
-        if self._3pBase != None:
-            if self.vhelixNum() != self._3pBase.vhelixNum():
-                return True
-            elif self.partId() != self._3pBase.partId():
-                return True
-        return False
+        """Return True if the prev or next base lives on a
+        different virtual helix than this base."""
+        return self._strandArray().isCrossover(self._n)
 
     def is3primeXover(self):
-        """Return True if no 3pBase, but 5pBase exists."""
-        if self._3pBase != None:
-            if self.vhelixNum() != self._3pBase.vhelixNum():
-                return True
-            elif self.partId() != self._3pBase.partId():
-                # print "something"
-                return True
-            # this case assumes the opposite of the first number case
-            elif abs(self._n - self._3pBase._n) != 1:
-                return True
-        return False
+        """Return True if the 3pBase is on another helix or
+        is not adjacent to this base."""
+        return self._strandArray().is3primeXover(self._n)
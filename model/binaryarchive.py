@@ -0,0 +1,285 @@
+# The MIT License
+#
+# Copyright (c) 2011 Wyss Institute at Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# http://www.opensource.org/licenses/mit-license.php
+
+"""
+binaryarchive.py
+"""
+import mmap
+import struct
+import sys
+from array import array
+from StringIO import StringIO
+from .decoder import Decoder, decode
+from .encoder import ChunkedWriter, encode
+from .enum import StrandType
+
+# A binary alternative to the JSON .cn2 format written by encoder. It holds
+# the same information (so either converts to the other without loss) but
+# keeps each strand as its links run-length encoded (see
+# StrandArray.linkRuns): a stretch of sequentially linked bases costs the
+# same however long it is, and the loader sets it up a run at a time
+# instead of parsing a token per base. Nothing derived from the links is
+# stored. All numbers are little-endian.
+#
+# The strands are not adopted from the file as they stand. Fixed-width
+# link arrays could be mapped in without decoding, but they cost 12 bytes
+# for every base of each 64-base chunk that holds a link, linked or not,
+# which made the archives of sparsely filled helices larger than the JSON. Runs are decoded straight into the
+# chunks of the strands' sparse arrays instead (see setLinkRuns): a run
+# costs a slice assignment per chunk it covers, and chunks that no run
+# reaches are never allocated. For honeycomb designs of 64-base helices,
+# 1000 helices load in 0.25 s against 1.3 s from JSON, and 5000 in 1.4 s
+# against 7.3 s; most of what remains is building the VirtualHelix
+# objects themselves.
+#
+# header    magic, version (uint32), #parts (uint32)
+# part      class name, name (uint32 byte count + utf-8 each),
+#           numBases, #helices (uint32 each),
+#           helix table: row, col, number (int32 each) per helix,
+#           then a strand record for the scaffold and the staple strand
+#           of every helix, in helix table order
+# strand    #slots, #runs, #explicit bases (uint32 each),
+#           slots: the helix table index of each helix slot (int32),
+#           runs: kind, start index, count (int32 each) per run,
+#           explicit bases: 5' slot, 5' index, 3' slot, 3' index (int32
+#           each) per base of the explicit runs
+
+Magic = '\x89cn2bin\n'
+Version = 2
+_header = struct.Struct('<8sII')
+_uint32 = struct.Struct('<I')
+_uint32Pair = struct.Struct('<II')
+_uint32Triple = struct.Struct('<III')
+_strandTypes = (StrandType.Scaffold, StrandType.Staple)
+_swapBytes = sys.byteorder != 'little'
+
+class ArchivedStrand(object):
+    """The links of one strand as read from a binary archive, which a
+    VirtualHelix installs into its StrandArray once the helices that the
+    slots refer to exist"""
+    def __init__(self, helices, runs, explicit):
+        self._helices = helices
+        self._runs = runs
+        self._explicit = explicit
+
+    def resolveRefsWith(self, decoder):
+        """See Decoder.resolveRefsIn"""
+        return ArchivedStrand(decoder.resolveRefsIn(self._helices),\
+                              self._runs, self._explicit)
+
+    def installInto(self, strand):
+        try:
+            strand.setLinkRuns(self._helices, self._runs, self._explicit)
+        except ValueError as e:
+            raise TypeError("binary archive has bad links for %s: %s" %\
+                                                        (strand._vhelix, e))
+
+class BinaryEncoder(object):
+    """Writes a Document and its parts as a binary archive"""
+    def __init__(self, rootObj):
+        self.root = rootObj
+
+    def dump(self, io):
+        out = ChunkedWriter(io)
+        sr = {}
+        self.root.fillSimpleRep(sr)
+        parts = sr['parts']
+        out.write(_header.pack(Magic, Version, len(parts)))
+        for part in parts:
+            self.encodePart(out, part)
+        out.flush()
+
+    def dumps(self):
+        out = StringIO()
+        self.dump(out)
+        return out.getvalue()
+
+    def encodePart(self, out, part):
+        sr = {}
+        part.fillSimpleRep(sr)
+        helices = sr['virtualHelices']  # ((row, col), num, vh)
+        for string in (sr['.class'], sr['name']):
+            string = unicode(string).encode('utf-8')
+            out.write(_uint32.pack(len(string)))
+            out.write(string)
+        numBases = helices[0][2].numBases() if helices else part.numBases()
+        out.write(_uint32Pair.pack(numBases, len(helices)))
+        table = array('i')
+        for (row, col), num, vh in helices:
+            table.extend((row, col, num))
+        out.write(self.arrayBytes(table))
+        helixToIndex = dict((vh, i) for i, (coord, num, vh) in\
+                                                        enumerate(helices))
+        for coord, num, vh in helices:
+            for strandType in _strandTypes:
+                self.encodeStrand(out, vh._strand(strandType), helixToIndex)
+            out.maybeFlush()
+
+    def encodeStrand(self, out, strand, helixToIndex):
+        helices, runs, explicit = strand.linkRuns()
+        try:
+            slots = array('i', [helixToIndex[vh] for vh in helices])
+        except KeyError:
+            raise ValueError("%s links to a helix outside of its part" %\
+                                                                strand._vhelix)
+        out.write(_uint32Triple.pack(len(slots), len(runs) // 3,\
+                                     len(explicit) // 4))
+        for arr in (slots, runs, explicit):
+            out.write(self.arrayBytes(arr))
+
+    def arrayBytes(self, arr):
+        if _swapBytes and arr.itemsize > 1:
+            arr = array(arr.typecode, arr)
+            arr.byteswap()
+        return arr.tostring()
+
+class BinaryDecoder(object):
+    """Reads a binary archive from a string or a buffer such as an mmap
+    into the package object that Decoder.decodePackage builds the
+    objects from"""
+    def __init__(self, buf):
+        self.buf = buf
+        self.offset = 0
+        self.objects = []
+
+    def decode(self, deferSignals=True):
+        return Decoder(deferSignals).decodePackage(self.package())
+
+    def package(self):
+        magic, version, numParts = self.unpack(_header)
+        if magic != Magic:
+            raise TypeError("not a binary caDNAno2 archive")
+        if version != Version:
+            raise TypeError("binary archive version %i, expected %i" %\
+                                                        (version, Version))
+        parts = [self.decodePart() for i in xrange(numParts)]
+        if self.offset != len(self.buf):
+            raise TypeError("binary archive has %i bytes past its end" %\
+                                                (len(self.buf) - self.offset))
+        objects = dict((str(i), o) for i, o in enumerate(self.objects))
+        return {'.format': 'caDNAno2',\
+                '.root': {'.class': 'Document', 'parts': parts},\
+                '.objects': objects}
+
+    def decodePart(self):
+        """Appends the part and its helices to self.objects and returns a
+        ref to the part"""
+        className, name = self.readString(), self.readString()
+        numBases, numHelices = self.unpack(_uint32Pair)
+        table = self.readArray('i', 3 * numHelices)
+        numbers, coords = table[2::3], zip(table[0::3], table[1::3])
+        if numHelices and (min(numbers) < 0 or\
+                           len(set(numbers)) != numHelices or\
+                           len(set(coords)) != numHelices):
+            raise TypeError("binary archive has a bad helix table")
+        partId = len(self.objects)
+        helixRefs = [{'.': partId + 1 + i} for i in xrange(numHelices)]
+        coordsAndNumToVH = []
+        self.objects.append({'.class': str(className),\
+                             'virtualHelices': coordsAndNumToVH,\
+                             'name': name})
+        for i in xrange(numHelices):
+            (row, col), num = coords[i], numbers[i]
+            coordsAndNumToVH.append([[row, col], num, helixRefs[i]])
+            d = {'.class': 'VirtualHelix', 'tentativeHelixID': num,\
+                 'numBases': numBases}
+            d['scafld'] = self.decodeStrand(helixRefs, i)
+            d['staple'] = self.decodeStrand(helixRefs, i)
+            self.objects.append(d)
+        return {'.': partId}
+
+    def decodeStrand(self, helixRefs, helixIndex):
+        numSlots, numRuns, numExplicit = self.unpack(_uint32Triple)
+        slots = self.readArray('i', numSlots)
+        if not slots or slots[0] != helixIndex or\
+           min(slots) < 0 or max(slots) >= len(helixRefs):
+            raise TypeError("binary archive has bad helix slots for "\
+                            "helix %i" % helixIndex)
+        runs = self.readArray('i', 3 * numRuns)
+        explicit = self.readArray('i', 4 * numExplicit)
+        return ArchivedStrand([helixRefs[i] for i in slots], runs, explicit)
+
+    def unpack(self, s):
+        if self.offset + s.size > len(self.buf):
+            raise TypeError("binary archive is truncated")
+        ret = s.unpack_from(self.buf, self.offset)
+        self.offset += s.size
+        return ret
+
+    def readString(self):
+        n, = self.unpack(_uint32)
+        if self.offset + n > len(self.buf):
+            raise TypeError("binary archive is truncated")
+        self.offset += n
+        try:
+            return self.buf[self.offset - n:self.offset].decode('utf-8')
+        except UnicodeDecodeError:
+            raise TypeError("binary archive has a bad string")
+
+    def readArray(self, typecode, count):
+        ret = array(typecode)
+        end = self.offset + count * ret.itemsize
+        if end > len(self.buf):
+            raise TypeError("binary archive is truncated")
+        ret.fromstring(self.buf[self.offset:end])
+        self.offset = end
+        if _swapBytes:
+            ret.byteswap()
+        return ret
+
+################## Public API ####################
+def isBinaryArchive(buf):
+    """True if buf (a string or buffer) starts like a binary archive"""
+    return buf[:len(Magic)] == Magic
+
+def encodeBinary(root, encodeIntoStream=None):
+    """Like encoder.encode, but writes a binary archive"""
+    e = BinaryEncoder(root)
+    if encodeIntoStream == None:
+        return e.dumps()
+    else:
+        e.dump(encodeIntoStream)
+
+def decodeBinary(buf):
+    """The root object of the binary archive in buf, which can be a string
+    or any buffer (such as an mmap) that supports slicing"""
+    return BinaryDecoder(buf).decode()
+
+def load(filename):
+    """The root object of the archive in filename, in either format. The
+    file is memory mapped rather than read in."""
+    with open(filename, 'rb') as f:
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        if isBinaryArchive(buf):
+            return decodeBinary(buf)
+        return decode(buf[:])
+    finally:
+        buf.close()
+
+def jsonToBinary(string, encodeIntoStream=None):
+    return encodeBinary(decode(string), encodeIntoStream)
+
+def binaryToJson(buf, encodeIntoStream=None):
+    return encode(decodeBinary(buf), encodeIntoStream)
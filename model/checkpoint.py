@@ -0,0 +1,87 @@
+# The MIT License
+#
+# Copyright (c) 2011 Wyss Institute at Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# http://www.opensource.org/licenses/mit-license.php
+
+"""
+checkpoint.py
+"""
+
+
+class PartCheckpoint(object):
+    """
+    A compact snapshot of the strands of every VirtualHelix in a DNAPart:
+    copies of the link arrays (see StrandArray.snapshot), the loops and
+    skips, and the colors of the oligos. Checkpoints let the undo history
+    forget old commands while still offering a way back to the states
+    those commands passed through.
+
+    A checkpoint does not record which helices are in the part, so it can
+    only be restored while the part still holds the same helices (at the
+    same length) as when it was taken; see canRestore.
+    """
+    def __init__(self, part):
+        super(PartCheckpoint, self).__init__()
+        self._part = part
+        self._numBases = part.numBases()
+        self._helices = {}  # VirtualHelix -> (scaf, stap, scafLoops, stapLoops)
+        for vh in part.getVirtualHelices():
+            self._helices[vh] = (vh._scaffoldBases.snapshot(),\
+                                 vh._stapleBases.snapshot(),\
+                                 vh._scaffoldLoops.copy(),\
+                                 vh._stapleLoops.copy())
+        self._endColors = part.oligoIndex().endColors()
+
+    def part(self):
+        return self._part
+
+    def byteSize(self):
+        """Approximate number of bytes held by the link arrays"""
+        total = 0
+        for scaf, stap, scafLoops, stapLoops in self._helices.itervalues():
+            for snap in (scaf, stap):
+                total += sum(arr.allocatedBytes() for arr in snap[1:])
+        return total
+
+    def canRestore(self):
+        part = self._part
+        if part.numBases() != self._numBases:
+            return False
+        helices = list(part.getVirtualHelices())
+        return len(helices) == len(self._helices) and\
+               all(vh in self._helices for vh in helices)
+
+    def restore(self):
+        """Puts every strand of the part back the way it was when the
+        receiver was taken. Only DNAPart.RestoreCheckpointCommand should
+        call this method."""
+        assert(self.canRestore())
+        part = self._part
+        with part.batchEdit():
+            for vh, (scaf, stap, scafLoops, stapLoops) in\
+                                                self._helices.iteritems():
+                vh._scaffoldBases.restoreSnapshot(scaf)
+                vh._stapleBases.restoreSnapshot(stap)
+                vh._scaffoldLoops = scafLoops.copy()
+                vh._stapleLoops = stapLoops.copy()
+                vh.emitModificationSignal()
+            part.oligoIndex().rebuild(self._endColors)
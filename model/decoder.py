@@ -37,12 +37,24 @@ classNameToClassMap['Document'] = Document
 classNameToClassMap['VirtualHelix'] = VirtualHelix
 
 class Decoder(object):
-    """Has to be a class because it carries state (object ids)"""
-    def __init__(self):
+    """Has to be a class because it carries state (object ids)
+
+    Unless deferSignals is False, the objects that have beginLoading and
+    endLoading methods (Document, DNAPart) are told when the decoder
+    starts and finishes filling them in, so they can hold their signals
+    back and announce the finished model once. The root object is
+    told last."""
+    def __init__(self, deferSignals=True):
         self.idToObj=[]
         self.objsWithDeferredInit=[]
+        self.deferSignals = deferSignals
     def decode(self,string):
-        packageObject = json.loads(string)
+        return self.decodePackage(json.loads(string))
+
+    def decodePackage(self, packageObject):
+        """Builds the objects of an archive that has already been parsed
+        into simple types (see binaryarchive for the other source of
+        these)"""
         assert(packageObject[".format"]=="caDNAno2")
         pkObjs = packageObject[".objects"]
         objs = []
@@ -64,11 +76,21 @@ class Decoder(object):
             self.objsWithDeferredInit.append((archivedClass, archivedDict, newObj))
             self.idToObj.append(newObj)
         self.objsWithDeferredInit.sort(key=lambda x: x[0].finishInitPriority)
-        for  objClass, objDict, obj in self.objsWithDeferredInit:
-            completeArchivedDict = self.resolveRefsIn(objDict)
-            # This time the argument passed is called completeArchivedDict because
-            # refs have been resolved by resolveRefsIn
-            obj.finishInitWithArchivedDict(completeArchivedDict)
+        loading = []
+        if self.deferSignals:
+            loading = [obj for obj in self.idToObj\
+                       if hasattr(obj, 'beginLoading')]
+        for obj in loading:
+            obj.beginLoading()
+        try:
+            for  objClass, objDict, obj in self.objsWithDeferredInit:
+                completeArchivedDict = self.resolveRefsIn(objDict)
+                # This time the argument passed is called completeArchivedDict because
+                # refs have been resolved by resolveRefsIn
+                obj.finishInitWithArchivedDict(completeArchivedDict)
+        finally:
+            for obj in loading:
+                obj.endLoading()
         return self.idToObj[-1]  # The root object
             
     def resolveRefsIn(self, obj):
@@ -86,6 +108,8 @@ class Decoder(object):
             for v in obj:
                 ret.append(self.resolveRefsIn(v))
             return ret
+        if hasattr(obj, 'resolveRefsWith'):
+            return obj.resolveRefsWith(self)
         raise TypeError("Cannot resolve refs in (%s)%s; unfamiliar type"%(type(obj),obj))
                 
     
@@ -52,20 +52,16 @@ class DNAHoneycombPart(DNAPart):
         vh = self.getVirtualHelix(vhref, returnNoneIfAbsent=False)
         return self.coordinateParityEven(vh.coord())
     
-    def getVirtualHelixNeighbors(self, vhref):
-        neighbors = []
-        vh = self.getVirtualHelix(vhref, returnNoneIfAbsent=False)
-        (r,c) = vh.coord()
-        if self.virtualHelixParityEven(vh):
-            neighbors.append(self.getVirtualHelix((r,c+1)))  # p0 neighbor (p0 is a direction)
-            neighbors.append(self.getVirtualHelix((r-1,c)))  # p1 neighbor
-            neighbors.append(self.getVirtualHelix((r,c-1)))  # p2 neighbor
+    def neighborCoords(self, coords):
+        (r,c) = coords
+        if self.coordinateParityEven(coords):
+            return [(r,c+1),  # p0 neighbor (p0 is a direction)
+                    (r-1,c),  # p1 neighbor
+                    (r,c-1)]  # p2 neighbor
         else:
-            neighbors.append(self.getVirtualHelix((r,c-1)))  # p0 neighbor (p0 is a direction)
-            neighbors.append(self.getVirtualHelix((r+1,c)))  # p1 neighbor
-            neighbors.append(self.getVirtualHelix((r,c+1)))  # p2 neighbor
-        return neighbors  # Note: the order and presence of Nones is important
-        # If you need the indices of available directions use range(0,len(neighbors))
+            return [(r,c-1),  # p0 neighbor (p0 is a direction)
+                    (r+1,c),  # p1 neighbor
+                    (r,c+1)]  # p2 neighbor
     
     def crossSectionType(self):
         """Returns the cross-section type of the DNA part."""
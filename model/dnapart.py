@@ -25,11 +25,19 @@ from exceptions import NotImplementedError
 import json
 from .part import Part
 from .virtualhelix import VirtualHelix
-from .enum import LatticeType
+from .oligoindex import OligoIndex
+from .checkpoint import PartCheckpoint
+from .sequence import SequenceMap
+from .latticegrid import LatticeGrid
+from .idallocator import HelixIDAllocator
+from .staplebreaker import StapleBreaker
+from .enum import LatticeType, StrandType
 from PyQt4.QtCore import pyqtSignal, QObject
 from PyQt4.QtGui import QUndoCommand
 from util import *
-from heapq import *
+from array import array
+from contextlib import contextmanager
+from collections import OrderedDict
 
 
 class DNAPart(Part):
@@ -51,20 +59,30 @@ class DNAPart(Part):
         self._maxRow = kwargs.get('maxRow', 20)
         self._maxCol = kwargs.get('maxCol', 20)
         # ID assignment infra
-        self.oddRecycleBin, self.evenRecycleBin = [], []
-        self.reserveBin = set()
-        self.highestUsedOdd = -1  # Used iff the recycle bin is empty and highestUsedOdd+2 is not in the reserve bin
-        self.highestUsedEven = -2  # same
+        self._idAllocator = HelixIDAllocator()
         # Transient and/or cached state
         self._staples = []
         self._scaffolds = []
-        self._selection = list()
+        self._selection = OrderedDict()  # (row,col) -> selected VirtualHelix
         self._coordToVirtualHelix = {}  # (row,col) -> VirtualHelix
+        # The same, as a dense grid (or None); see getVirtualHelix
+        self._grid = LatticeGrid(self._maxRow, self._maxCol)\
+                     if kwargs.get('denseGrid', True) else None
+        self._neighborSlots = {}  # VirtualHelix -> [neighbor in direction p]
+        self._oligoIndex = OligoIndex(self.getVirtualHelices)
+        self._batchDepth = 0
+        self._loading = False  # See beginLoading
+        self._modifiedRanges = {}  # VirtualHelix -> [lo, hi] during a batch
+        self._crossoverLUT = {}  # (facingRight, strandType, p) -> indices
+        self._crossoverLUTNumBases = None  # Part length _crossoverLUT fits
+        self._sequenceMap = None  # Set by applySequence
         # Abstract
         # self._maxBase = 0  # honeycomb is 42
         # self._activeSlice = 0  # honeycomb is 21
         if self.selectAllBehavior:
             self.virtualHelixAtCoordsChanged.connect(self.updateSelectionFromVHChange)
+            self.virtualHelicesAtCoordsChanged.connect(\
+                                        self.updateSelectionFromVHChanges)
     
     def setDocument(self, newDoc):
         """Only called by Document"""
@@ -73,6 +91,7 @@ class DNAPart(Part):
         if ctrlr:
             self.dimensionsWillChange.connect(ctrlr.dirty)
             self.virtualHelixAtCoordsChanged.connect(ctrlr.dirty)
+            self.virtualHelicesAtCoordsChanged.connect(ctrlr.dirty)
     
     def dimensions(self):
         return (self._maxRow, self._maxCol, self._maxBase)
@@ -83,9 +102,58 @@ class DNAPart(Part):
     dimensionsWillChange = pyqtSignal()
     def setDimensions(self, newDim):
         self.dimensionsWillChange.emit(newDim)
-        self._maxRow, self._maxCol, self._maxBase = newDim
-        for n in self._numberToVirtualHelix:
-            self._numberToVirtualHelix[n].setNumBases(self._maxBase)
+        self._maxRow, self._maxCol, newNumBases = newDim
+        if self._grid != None:
+            self._grid.resize(self._maxRow, self._maxCol)
+        if newNumBases == self._maxBase:
+            return
+        if self._numberToVirtualHelix:
+            self.undoStack().push(self.SetNumBasesCommand(self, newNumBases))
+        else:
+            self._maxBase = newNumBases
+
+    class SetNumBasesCommand(QUndoCommand):
+        """Resizes every helix of the part in one undo step. Bases that
+        fall off the end are disconnected first (crossovers into them
+        included) so that undo can restore their links; the strands
+        themselves are grown or truncated in bulk (see
+        StrandArray.resize)."""
+        def __init__(self, dnapart, newNumBases):
+            super(DNAPart.SetNumBasesCommand, self).__init__(\
+                                            "Changing the number of bases")
+            self._part = dnapart
+            self._oldNumBases = oldNB = dnapart.numBases()
+            self._newNumBases = newNumBases
+            self._commands = []
+            if newNumBases < oldNB:
+                for st in (StrandType.Scaffold, StrandType.Staple):
+                    for (fromVH, fromIdx), toEnd in\
+                            dnapart.getXoversInRange(st, newNumBases, oldNB):
+                        self._commands.append(\
+                                fromVH.Break3To5Command(st, fromVH, fromIdx))
+            for vh in dnapart.getVirtualHelices():
+                if newNumBases < oldNB:
+                    for st in (StrandType.Scaffold, StrandType.Staple):
+                        # Nothing past the last end or crossover needs
+                        # clearing
+                        breaks = vh._strand(st).segmentBreaks()
+                        if breaks and breaks[-1] >= newNumBases:
+                            self._commands.append(vh.ClearStrandCommand(vh,\
+                                        st, newNumBases, breaks[-1] + 1))
+                self._commands.append(vh.SetNumBasesCommand(vh, newNumBases))
+
+        def redo(self):
+            # VirtualHelix.SetNumBasesCommand checks against the part
+            self._part._maxBase = self._newNumBases
+            with self._part.batchEdit():
+                for c in self._commands:
+                    c.redo()
+
+        def undo(self):
+            self._part._maxBase = self._oldNumBases
+            with self._part.batchEdit():
+                for c in reversed(self._commands):
+                    c.undo()
         
     ############################# Archiving/Unarchiving #############################
     def fillSimpleRep(self, sr):
@@ -109,12 +177,14 @@ class DNAPart(Part):
     # finishInitWithArchivedDict, this time with all entries
     finishInitPriority = 0.0
     def finishInitWithArchivedDict(self, completeArchivedDict):
-        for coord, num, vh in completeArchivedDict['virtualHelices']:
-            if num%2:
-                self.highestUsedOdd = max(self.highestUsedOdd, num)
-            else:
-                self.highestUsedEven = max(self.highestUsedEven, num)
-            self.setVirtualHelixAt(coord, vh, requestSpecificIdnum=num, noUndo=True)
+        coordsAndNumToVH = completeArchivedDict['virtualHelices']
+        if coordsAndNumToVH:
+            # The part's length isn't archived; its helices know it
+            self._maxBase = coordsAndNumToVH[0][2].numBases()
+        for coord, num, vh in coordsAndNumToVH:
+            self._idAllocator.skipPast(num)
+        self.setVirtualHelicesAt([(coord, vh, num) for coord, num, vh in\
+                                  coordsAndNumToVH], noUndo=True)
         self._name = completeArchivedDict['name']
             
     ############################# VirtualHelix CRUD #############################
@@ -130,7 +200,11 @@ class DNAPart(Part):
         if type(vhref) in (int, long):
             vh = self._numberToVirtualHelix.get(vhref, None)
         elif type(vhref) in (tuple, list):
-            vh = self._coordToVirtualHelix.get(vhref, None)
+            row, col = vhref
+            if self._grid != None and row >= 0 and col >= 0:
+                vh = self._grid.get(row, col)
+            else:
+                vh = self._coordToVirtualHelix.get(tuple(vhref), None)
         else:
             vh = vhref
         if not isinstance(vh, VirtualHelix):
@@ -151,6 +225,22 @@ class DNAPart(Part):
         else:
             self.undoStack().push(c)
     
+    # [(row, col), ...] of every coordinate setVirtualHelicesAt changed
+    virtualHelicesAtCoordsChanged = pyqtSignal(object)
+    def setVirtualHelicesAt(self, coordsAndHelices, noUndo=False):
+        """
+        Like setVirtualHelixAt for each (coords, vh) or (coords, vh,
+        requestSpecificIdnum) in coordsAndHelices, in that order, but as
+        one undo step that emits virtualHelicesAtCoordsChanged once
+        instead of virtualHelixAtCoordsChanged for every helix, so that
+        views lay themselves out once however many helices are added.
+        """
+        c = self.SetHelicesCommand(self, coordsAndHelices)
+        if noUndo:
+            c.redo()
+        else:
+            self.undoStack().push(c)
+
     # emits virtualHelixAtCoordsChanged
     def renumberVirtualHelix(self, vhref, newNumber, automaticallyRenumberConflictingHelix=False):
         vh = getVirtualHelix(vhref, returnNoneIfAbsent = False)
@@ -164,6 +254,61 @@ class DNAPart(Part):
                 assert(False)  # Tried to assign an idnum belonging to another helix to vhref
         c = self.RenumberHelixCommand(self, vh.coords(), newNumber)
 
+    ############################# Neighbors #############################
+    # Every helix of the part has one slot per lattice direction (three in
+    # honeycomb) holding its neighbor that way or None. SetHelixCommand
+    # keeps the slots up to date as helices come and go, so that
+    # getVirtualHelixNeighbors doesn't have to look coordinates up.
+    def neighborCoords(self, coords):
+        """The (row, col) of each of the positions neighboring coords, in
+        direction order (the part decides what the directions are)"""
+        raise NotImplementedError
+
+    def getVirtualHelixNeighbors(self, vhref):
+        slots = self._neighborSlots.get(vhref, None)
+        if slots == None:
+            vh = self.getVirtualHelix(vhref, returnNoneIfAbsent=False)
+            slots = self._neighborSlots[vh]
+        return list(slots)  # Note: the order and presence of Nones is important
+        # If you need the indices of available directions use range(0,len(neighbors))
+
+    def _linkNeighbors(self, vh, coords):
+        """Fills in vh's slots and points its neighbors' slots back at it.
+        Only SetHelixCommand should call this method."""
+        slots = []
+        for neighborCoords in self.neighborCoords(coords):
+            neighbor = self._coordToVirtualHelix.get(neighborCoords, None)
+            if neighbor != None:
+                back = self.neighborCoords(neighborCoords).index(coords)
+                self._neighborSlots[neighbor][back] = vh
+            slots.append(neighbor)
+        self._neighborSlots[vh] = slots
+
+    def _unlinkNeighbors(self, vh):
+        """Only SetHelixCommand should call this method."""
+        for neighbor in self._neighborSlots.pop(vh):
+            if neighbor != None:
+                slots = self._neighborSlots[neighbor]
+                slots[slots.index(vh)] = None
+
+    def getVirtualHelicesInRegion(self, startRow, endRow, startCol, endCol):
+        """The helices in rows startRow to endRow and columns startCol to
+        endCol (inclusive), row by row"""
+        if self._grid != None and startRow >= 0 and startCol >= 0:
+            return self._grid.region(startRow, endRow, startCol, endCol)
+        return [self._coordToVirtualHelix[coord] for coord in\
+                sorted(self._coordToVirtualHelix) if\
+                startRow <= coord[0] <= endRow and\
+                startCol <= coord[1] <= endCol]
+
+    def _setGridSlot(self, coords, vh):
+        """Only SetHelixCommand should call this method."""
+        row, col = coords
+        # The grid has no negative coordinates; getVirtualHelix looks
+        # those up in _coordToVirtualHelix alone
+        if self._grid != None and row >= 0 and col >= 0:
+            self._grid.set(row, col, vh)
+
     def getVirtualHelixCount(self):
         """docstring for getVirtualHelixList"""
         return len(self._numberToVirtualHelix)
@@ -171,6 +316,302 @@ class DNAPart(Part):
     def getVirtualHelices(self):
         return [self._numberToVirtualHelix[n] for n in self._numberToVirtualHelix]
 
+    ############################# Crossovers #############################
+    # The crossover registry is kept per strand by the StrandArrays of the
+    # part's helices, which index the 3' and 5' ends of crossovers as links
+    # change. These queries only ever visit existing crossovers.
+    # Crossovers are returned as ((fromVH, fromIdx), (toVH, toIdx)) where
+    # the from base provides the 3' pointer.
+    def getXovers(self, strandType):
+        """All crossovers of strandType in the part"""
+        ret = []
+        for vh in self.getVirtualHelices():
+            ret.extend(vh.get3PrimeXovers(strandType))
+        return ret
+
+    def getXoversTouchingHelix(self, vhref, strandType):
+        """Crossovers of strandType that leave from or arrive at vhref"""
+        vh = self.getVirtualHelix(vhref, returnNoneIfAbsent=False)
+        ret = vh.get3PrimeXovers(strandType)
+        strand = vh._strand(strandType)
+        for i in strand.fivePrimeXoverIndices():
+            fromBase = strand.get5pBase(i)
+            if fromBase.vhelix() is not vh:  # Else already in ret
+                ret.append(((fromBase.vhelix(), fromBase._n), (vh, i)))
+        return ret
+
+    def getXoversInRange(self, strandType, startIndex, endIndex):
+        """Crossovers of strandType with at least one end at a base index
+        in [startIndex, endIndex)"""
+        ret = []
+        for vh in self.getVirtualHelices():
+            ret.extend(vh.get3PrimeXovers(strandType, startIndex, endIndex))
+            strand = vh._strand(strandType)
+            for i in strand.fivePrimeXoverIndices(startIndex, endIndex):
+                fromBase = strand.get5pBase(i)
+                if not startIndex <= fromBase._n < endIndex:  # Else in ret
+                    ret.append(((fromBase.vhelix(), fromBase._n), (vh, i)))
+        return ret
+
+    # The lattice tables (scafL, scafR, stapL, stapR) give the offsets
+    # within each step-long repeat at which a helix can cross over to its
+    # neighbor in direction p (see getVirtualHelixNeighbors). They are
+    # expanded over the length of the part once, and again only when that
+    # length changes.
+    def potentialCrossoverIndices(self, facingRight, strandType, p):
+        """Sorted by repeat, the base indices at which a helix can cross
+        over to its neighbor in direction p. Should be considered read
+        only."""
+        if self._crossoverLUTNumBases != self._maxBase:
+            self._rebuildCrossoverLUT()
+        return self._crossoverLUT[(bool(facingRight), strandType, p)]
+
+    def _rebuildCrossoverLUT(self):
+        luts = {(False, StrandType.Scaffold): self.scafL,\
+                (True, StrandType.Scaffold): self.scafR,\
+                (False, StrandType.Staple): self.stapL,\
+                (True, StrandType.Staple): self.stapR}
+        repeats = range(0, self._maxBase, self.step)
+        self._crossoverLUT = {}
+        for (facingRight, strandType), lut in luts.iteritems():
+            for p in range(len(lut)):
+                self._crossoverLUT[(facingRight, strandType, p)] =\
+                        array('i', (i + j for i in repeats for j in lut[p]))
+        self._crossoverLUTNumBases = self._maxBase
+
+    ############################# Oligos #############################
+    def oligoIndex(self):
+        return self._oligoIndex
+
+    def getOligos(self, strandType=None):
+        """Every oligo (staple or scaffold strand) in the part, without
+        walking any bases"""
+        return self._oligoIndex.oligos(strandType)
+
+    ############################# Sequences #############################
+    def applySequence(self, sequence, scaffoldOligo=None):
+        """
+        Applies sequence (a string such as M13mp18) to scaffoldOligo, by
+        default the longest scaffold oligo, starting at its 5' end, and
+        derives the sequence of every staple from it. Returns the
+        resulting SequenceMap, which sequenceMap() also returns until the
+        next call. Sequences are not part of the undo history.
+        """
+        if scaffoldOligo == None:
+            scaffolds = self.getOligos(StrandType.Scaffold)
+            if not scaffolds:
+                return None
+            scaffoldOligo = max(scaffolds, key=lambda o: o.length())
+        sm = SequenceMap(self)
+        sm.applyScaffoldSequence(sequence, scaffoldOligo)
+        sm.deriveStapleSequences()
+        self._sequenceMap = sm
+        return sm
+
+    def sequenceMap(self):
+        return self._sequenceMap
+
+    ############################# Auto-staple #############################
+    def autoStaple(self):
+        """
+        Lays down a staple strand opposite every stretch of scaffold that
+        has none yet, then joins neighboring helices' staples with a pair
+        of crossovers at every position of the lattice tables (stapL,
+        stapR) where both helices have staple bases free to cross over.
+        Everything is one undo step, announced once per helix (see
+        batchEdit).
+        """
+        self.undoStack().push(self.AutoStapleCommand(self))
+
+    def _autoStapleCommands(self):
+        """Yields the commands that auto-staple the part. Which crossovers
+        can form depends on the staples laid down before them, so each
+        command must be redone before the next one is asked for."""
+        st = StrandType.Staple
+        helices = sorted(self.getVirtualHelices(), key=lambda vh: vh.number())
+        for vh in helices:
+            staple = vh._strand(st)
+            for startIdx, startIsXO, endIdx, endIsXO in\
+                                    vh.getSegments(StrandType.Scaffold):
+                for lo, hi in staple.emptyRanges(startIdx, endIdx):
+                    if lo < hi:  # A lone base can't be linked to anything
+                        yield vh.FillStrandCommand(vh, st, lo, hi)
+        # Each pair of neighbors crosses over at the same indices in both
+        # directions, so visit it from its even helix only
+        for vh in helices:
+            if not vh.evenParity():
+                continue
+            for p, neighbor in enumerate(vh.neighbors()):
+                if neighbor == None:
+                    continue
+                rights = set(self.potentialCrossoverIndices(True, st, p))
+                lefts = [i for i in self.potentialCrossoverIndices(False,\
+                                                    st, p) if i + 1 in rights]
+                couldForm = vh.crossoverStatesAt(st,\
+                    [(i, neighbor, i) for l in lefts for i in (l, l + 1)])[0]
+                # The helix whose staple heads up in index crosses over on
+                # the left of the pair, the other one on the right
+                up, down = vh, neighbor
+                if not vh.directionOfStrandIs5to3(st):
+                    up, down = neighbor, vh
+                xovers = []
+                for k, l in enumerate(lefts):
+                    if couldForm[2 * k] and couldForm[2 * k + 1]:
+                        xovers.append((up, l, down, l))
+                        xovers.append((down, l + 1, up, l + 1))
+                if xovers:
+                    yield vh.InstallXoversCommand(st, xovers)
+
+    def breakStaples(self, minLength=18, maxLength=60, processes=None):
+        """
+        Breaks every staple longer than maxLength nucleotides into pieces
+        of minLength to maxLength, as one undo step (see StapleBreaker,
+        which also takes the finer settings). Returns the StapleBreaker,
+        whose summary() reports what it did and how fast.
+        """
+        breaker = StapleBreaker(self, minLength, maxLength)
+        breaker.run(processes)
+        return breaker
+
+    class AutoStapleCommand(QUndoCommand):
+        def __init__(self, dnapart):
+            super(DNAPart.AutoStapleCommand, self).__init__("Auto-staple")
+            self._part = dnapart
+            self._commands = None  # Worked out on the first redo
+
+        def redo(self):
+            part = self._part
+            with part.batchEdit():
+                if self._commands == None:
+                    self._commands = []
+                    for c in part._autoStapleCommands():
+                        c.redo()
+                        self._commands.append(c)
+                else:
+                    for c in self._commands:
+                        c.redo()
+
+        def undo(self):
+            with self._part.batchEdit():
+                for c in reversed(self._commands):
+                    c.undo()
+
+    ############################# Batch Editing #############################
+    @contextmanager
+    def batchEdit(self):
+        """
+        with part.batchEdit():
+            ...edit lots of bases...
+        defers each helix's basesModified until the outermost batch ends
+        and then emits it once, with basesModifiedInRange covering every
+        base that changed. MacroCommand runs inside a batch automatically.
+        """
+        self._batchDepth += 1
+        try:
+            yield
+        finally:
+            self._batchDepth -= 1
+            if self._batchDepth == 0:
+                self._flushModifiedBases()
+
+    def isBatchEditing(self):
+        return self._batchDepth > 0
+
+    def _noteModifiedBases(self, vh, startIndex, endIndex):
+        """Only VirtualHelix should call this method."""
+        r = self._modifiedRanges.get(vh, None)
+        if r == None:
+            self._modifiedRanges[vh] = [startIndex, endIndex]
+        else:
+            r[0] = min(r[0], startIndex)
+            r[1] = max(r[1], endIndex)
+
+    def _flushModifiedBases(self):
+        modified, self._modifiedRanges = self._modifiedRanges, {}
+        for vh in sorted(modified, key=lambda vh: vh.number()):
+            startIndex, endIndex = modified[vh]
+            endIndex = min(endIndex, vh.numBases() - 1)  # It may have shrunk
+            vh.basesModified.emit()
+            vh.basesModifiedInRange.emit(startIndex, endIndex)
+
+    class MacroCommand(QUndoCommand):
+        """Runs a sequence of commands as one undo step. Qt's own
+        beginMacro/endMacro can't be observed from Python when the stack
+        later undoes or redoes the macro, so model code that wants its
+        notifications coalesced pushes one of these instead."""
+        def __init__(self, dnapart, text, commands):
+            super(DNAPart.MacroCommand, self).__init__(text)
+            self._part = dnapart
+            self._commands = list(commands)
+
+        def redo(self):
+            with self._part.batchEdit():
+                for c in self._commands:
+                    c.redo()
+
+        def undo(self):
+            with self._part.batchEdit():
+                for c in reversed(self._commands):
+                    c.undo()
+
+    ############################# Loading #############################
+    def beginLoading(self):
+        """
+        Decoder calls this before it fills the part in from an archive.
+        Until endLoading, adding helices announces nothing and base
+        modifications are batched (see batchEdit), so that nothing
+        watching the part reacts to a half-built model.
+        """
+        self._loading = True
+        self._batchDepth += 1
+
+    def endLoading(self):
+        """Announces every helix of the loaded part at once, with
+        virtualHelicesAtCoordsChanged"""
+        self._loading = False
+        self._batchDepth -= 1
+        if self._batchDepth == 0:
+            self._flushModifiedBases()
+        helices = sorted(self.getVirtualHelices(), key=lambda vh: vh.number())
+        if helices:
+            self.virtualHelicesAtCoordsChanged.emit(\
+                                            [vh.coord() for vh in helices])
+
+    ############################# Checkpoints #############################
+    def checkpoint(self):
+        """Returns a PartCheckpoint of the strands of every helix"""
+        return PartCheckpoint(self)
+
+    def restoreCheckpoint(self, checkpoint):
+        """Undoably puts the strands back the way they were when checkpoint
+        was taken. Returns the command, whose oldState() the undo history
+        counts against its checkpoint budget."""
+        assert(checkpoint.part() == self)
+        c = self.RestoreCheckpointCommand(self, checkpoint)
+        self.undoStack().push(c)
+        return c
+
+    class RestoreCheckpointCommand(QUndoCommand):
+        def __init__(self, dnapart, checkpoint):
+            super(DNAPart.RestoreCheckpointCommand, self).__init__(\
+                                                    "Restoring a checkpoint")
+            self._part = dnapart
+            self._checkpoint = checkpoint
+            self._oldState = None
+
+        def redo(self):
+            if self._oldState == None:
+                self._oldState = PartCheckpoint(self._part)
+            self._checkpoint.restore()
+
+        def undo(self):
+            self._oldState.restore()
+
+        def oldState(self):
+            """The PartCheckpoint taken by the first redo, which undo
+            restores"""
+            return self._oldState
+
     ############################# VirtualHelix Private CRUD #############################
     class SetHelixCommand(QUndoCommand):
         def __init__(self, dnapart, coords, vh, requestSpecificIdnum=None):
@@ -179,28 +620,90 @@ class DNAPart(Part):
             self.part = dnapart
             self.vhelix = vh
             self.requestedNum = requestSpecificIdnum
+            self.movedFrom = None  # (part, coords, number) vhelix left
         def redo(self, actuallyUndo=False):
+            self._setHelix(actuallyUndo)
+            if not self.part._loading:
+                self.part.virtualHelixAtCoordsChanged.emit(self.row, self.col)
+                if self.movedFrom != None:
+                    oldPart, (row, col), num = self.movedFrom
+                    oldPart.virtualHelixAtCoordsChanged.emit(row, col)
+        def undo(self):
+            # assert(self.oldVH)  # oldVH might be None
+            self.redo(actuallyUndo=True)
+        def _setHelix(self, actuallyUndo=False):
+            """redo or undo without the notification"""
             part, vh = self.part, self.vhelix
             currentVH = part.getVirtualHelix((self.row, self.col))
             if actuallyUndo:
-                vh = self.oldVH
+                vh, requestedNum = self.oldVH, self.oldNum
             else:
                 self.oldVH = currentVH
+                self.oldNum = currentVH.number() if currentVH else None
+                requestedNum = self.requestedNum
+                # A helix that already has a slot moves out of it, as part
+                # of this command so that one undo puts it back
+                self.movedFrom = None
+                oldPart = vh.part() if vh else None
+                if vh and vh is not currentVH and oldPart != None and\
+                   oldPart.getVirtualHelix(vh.coord()) is vh:
+                    self.movedFrom = (oldPart, vh.coord(), vh.number())
+                    self._removeHelix(oldPart, vh)
             if currentVH:
-                del self.part._coordToVirtualHelix[currentVH.coord()]
-                del self.part._numberToVirtualHelix[currentVH.number()]
-                self.part.recycleHelixIDNumber(currentVH.number())
+                self._removeHelix(part, currentVH)
             if vh:
-                newID = part.reserveHelixIDNumber(\
-                            parityEven=self.part.coordinateParityEven((self.row, self.col)),\
-                            requestedIDnum=self.requestedNum)
-                vh._setPart(part, self.row, self.col, newID)
-                part._numberToVirtualHelix[newID] = vh
-                part._coordToVirtualHelix[(self.row, self.col)] = vh
-            part.virtualHelixAtCoordsChanged.emit(self.row, self.col)
+                newID = self._addHelix(part, vh, (self.row, self.col),\
+                                       requestedNum)
+                if not actuallyUndo:
+                    self.requestedNum = newID  # Redo brings it back as is
+            if actuallyUndo and self.movedFrom != None:
+                oldPart, coords, num = self.movedFrom
+                self._addHelix(oldPart, self.vhelix, coords, num)
+        def _removeHelix(self, part, vh):
+            part._unlinkNeighbors(vh)
+            part._setGridSlot(vh.coord(), None)
+            del part._coordToVirtualHelix[vh.coord()]
+            del part._numberToVirtualHelix[vh.number()]
+            part.recycleHelixIDNumber(vh.number())
+        def _addHelix(self, part, vh, coords, requestedNum):
+            newID = part.reserveHelixIDNumber(\
+                        parityEven=part.coordinateParityEven(coords),\
+                        requestedIDnum=requestedNum)
+            vh._setPart(part, coords[0], coords[1], newID)
+            part._numberToVirtualHelix[newID] = vh
+            part._coordToVirtualHelix[coords] = vh
+            part._setGridSlot(coords, vh)
+            part._linkNeighbors(vh, coords)
+            return newID
+    
+    class SetHelicesCommand(QUndoCommand):
+        """Many SetHelixCommands that notify once (see
+        setVirtualHelicesAt)"""
+        def __init__(self, dnapart, coordsAndHelices):
+            super(DNAPart.SetHelicesCommand, self).__init__()
+            self.part = dnapart
+            self.commands = [DNAPart.SetHelixCommand(dnapart, *item)\
+                             for item in coordsAndHelices]
+        def redo(self):
+            for c in self.commands:
+                c._setHelix()
+            self.emitChange()
         def undo(self):
-            # assert(self.oldVH)  # oldVH might be None
-            self.redo(actuallyUndo=True)
+            for c in reversed(self.commands):
+                c._setHelix(actuallyUndo=True)
+            self.emitChange()
+        def emitChange(self):
+            if self.part._loading:
+                return
+            coords = [(c.row, c.col) for c in self.commands]
+            coords.extend(c.movedFrom[1] for c in self.commands\
+                          if c.movedFrom != None and\
+                             c.movedFrom[0] == self.part)
+            for c in self.commands:
+                if c.movedFrom != None and c.movedFrom[0] != self.part:
+                    c.movedFrom[0].virtualHelixAtCoordsChanged.emit(\
+                                                        *c.movedFrom[1])
+            self.part.virtualHelicesAtCoordsChanged.emit(coords)
     
     class RenumberHelixCommand(QUndoCommand):
         def __init__(self, dnapart, coords, newNumber):
@@ -238,43 +741,14 @@ class DNAPart(Part):
         if num != None: # We are handling a request for a particular number
             assert num >= 0, long(num) == num
             assert not num in self._numberToVirtualHelix
-            if num in self.oddRecycleBin:
-                self.oddRecycleBin.remove(num)
-                heapify(self.oddRecycleBin)
-                return num
-            if num in self.evenRecycleBin:
-                self.evenRecycleBin.remove(num)
-                heapify(self.evenRecycleBin)
-                return num
-            self.reserveBin.add(num)
-            return num
-        # Just find any valid index (subject to parity constraints)
-        if parityEven:
-             if len(self.evenRecycleBin):
-                 return heappop(self.evenRecycleBin)
-             else:
-                 while self.highestUsedEven + 2 in self.reserveBin:
-                     self.highestUsedEven += 2
-                 self.highestUsedEven += 2
-                 return self.highestUsedEven
-        else:
-            if len(self.oddRecycleBin):
-                return heappop(self.oddRecycleBin)
-            else:
-                while self.highestUsedOdd + 2 in self.reserveBin:
-                    self.highestUsedOdd += 2
-                self.highestUsedOdd += 2
-                return self.highestUsedOdd
+        return self._idAllocator.reserve(parityEven, num)
 
     def recycleHelixIDNumber(self, n):
         """
         The caller's contract is to ensure that n is not used in *any* helix
         at the time of the calling of this function (or afterwards, unless
         reserveLabelForHelix returns the label again)"""
-        if n % 2 == 0:
-            heappush(self.evenRecycleBin,n)
-        else:
-            heappush(self.oddRecycleBin,n)
+        self._idAllocator.recycle(n)
 
     ############################# Transient State (doesn't get saved) #############################    
     def selection(self):
@@ -282,30 +756,73 @@ class DNAPart(Part):
         the slice view. @todo 1) implement this 2) make the selected 
         helices more prominent in the path view (this would allow one 
         to deal with lots and lots of helices)"""
-        return list(self._selection)
+        return self._selection.values()
+
+    def isSelected(self, vh):
+        return self._selection.get(vh.coord(), None) is vh
     
-    selectionWillChange = pyqtSignal(object)
+    # Emitted with the helices about to be added to and removed from
+    # the selection, before they are
+    selectionWillChange = pyqtSignal(object, object)
     def setSelection(self, newSelection):
         if self.selectAllBehavior:
             newSelection = self.getVirtualHelices()
-        ns = list(newSelection)
-        self.selectionWillChange.emit(ns)
-        self._selection = ns
+        ns = OrderedDict((vh.coord(), vh) for vh in newSelection)
+        old = self._selection
+        self._changeSelection(\
+            [vh for c, vh in ns.iteritems() if old.get(c, None) is not vh],\
+            [vh for c, vh in old.iteritems() if ns.get(c, None) is not vh])
     
     def selectAll(self, *args, **kwargs):
         self.setSelection(self.getVirtualHelices())
+
+    def addToSelection(self, vhs):
+        self._changeSelection(vhs, ())
+
+    def removeFromSelection(self, vhs):
+        if self.selectAllBehavior:
+            return
+        self._changeSelection((), vhs)
+
+    def _changeSelection(self, added, removed):
+        """Applies a change to the selection, announcing only what actually
+        changes. A helix added where another selected helix was replaces
+        it."""
+        sel = self._selection
+        removing = OrderedDict()
+        for vh in removed:
+            if sel.get(vh.coord(), None) is vh:
+                removing[vh.coord()] = vh
+        adding = OrderedDict()
+        for vh in added:
+            coord = vh.coord()
+            current = sel.get(coord, None)
+            if current is vh and coord not in removing:
+                continue
+            if current != None and current is not vh:
+                removing[coord] = current
+            adding[coord] = vh
+        if not adding and not removing:
+            return
+        self.selectionWillChange.emit(adding.values(), removing.values())
+        for coord in removing:
+            del sel[coord]
+        sel.update(adding)
     
+    def updateSelectionFromVHChanges(self, coordsList):
+        """updateSelectionFromVHChange for many coordinates at once"""
+        added, removed = [], []
+        for coord in coordsList:
+            vh = self.getVirtualHelix(coord)
+            selected = self._selection.get(coord, None)
+            if selected != None and selected is not vh:
+                removed.append(selected)
+            if vh != None:
+                added.append(vh)
+        self._changeSelection(added, removed)
+
     def updateSelectionFromVHChange(self, row, col):
-        coord = (row, col)
-        vh = self.getVirtualHelix(coord)
-        if vh:
-            s = self.selection()
-            s.append(vh)
-            self.setSelection(s)
-        else:
-            s = [vh for vh in self.selection() if vh.coord()!=coord]
-            self.setSelection(s)
-            
+        self.updateSelectionFromVHChanges(((row, col),))
     
     def activeSlice(self):
         """The active slice is the index of the slice selected by the
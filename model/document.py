@@ -38,6 +38,7 @@ class Document(QObject):
         self._parts = []
         self._selectedPart = None
         self._controller = None
+        self._loadedParts = None  # Parts added since beginLoading
     
     def controller(self):
         return self._controller
@@ -60,6 +61,9 @@ class Document(QObject):
     def addPart(self, part):
         self._parts.append(part)
         part.setDocument(self)
+        if self._loadedParts != None:
+            self._loadedParts.append(part)
+            return
         self.setSelectedPart(part)
         self.partAdded.emit(part)
 
@@ -93,3 +97,15 @@ class Document(QObject):
     def finishInitWithArchivedDict(self, completeArchivedDict):
         for part in completeArchivedDict['parts']:
             self.addPart(part)
+
+    def beginLoading(self):
+        """Until endLoading, addPart doesn't select or announce the parts
+        it adds, so that views aren't built for parts that aren't loaded
+        yet (see Decoder)"""
+        self._loadedParts = []
+
+    def endLoading(self):
+        parts, self._loadedParts = self._loadedParts, None
+        for part in parts:
+            self.setSelectedPart(part)
+            self.partAdded.emit(part)
@@ -31,30 +31,75 @@ from StringIO import StringIO
 from util import *
 import re
 
+class ChunkedWriter(object):
+    """Collects the many small strings written by an Encoder and hands
+    them to the underlying stream in chunks of about chunkSize
+    characters, so that a file sees a few large writes"""
+    def __init__(self, stream, chunkSize=1 << 16):
+        self.stream = stream
+        self.chunkSize = chunkSize
+        self._pieces = []
+        self._numFlushed = 0  # Pieces whose size has been counted
+        self._size = 0
+
+    def write(self, s):
+        self._pieces.append(s)
+
+    def maybeFlush(self):
+        """Flushes if a chunk's worth has built up. The Encoder calls this
+        between objects, which keeps the per-write cost to an append."""
+        pieces = self._pieces
+        self._size += sum(len(p) for p in pieces[self._numFlushed:])
+        self._numFlushed = len(pieces)
+        if self._size >= self.chunkSize:
+            self.flush()
+
+    def flush(self):
+        if self._pieces:
+            self.stream.write(''.join(self._pieces))
+        self._pieces, self._numFlushed, self._size = [], 0, 0
+
 class Encoder(object):
-    def __init__(self, rootObj):
+    """Writes rootObj and everything it references as JSON. In the
+    default (pretty) layout an array or dict that would be long inline is
+    broken over lines, one item per line; compact leaves out all of
+    the layout whitespace."""
+    def __init__(self, rootObj, compact=False):
         self._objects = []
         self._objToIndex = {}  # Maps objects to their index in the _objects array
         self.root = rootObj
         self.indentLevel = 0
-        
+        self.compact = compact
+        # id(container) -> approxStrLength(container) for the object being
+        # written, so that nested containers are only measured once
+        self._lengths = {}
+
     def dump(self, io):
-        self.io = io
-        io.write('{".format":"caDNAno2", ".root":')
-        self.encodeObj(self.root, useRef=False)
-        io.write(', ".objects":{\n ')
+        out = ChunkedWriter(io)
+        self.io = out
+        sep = ',' if self.compact else ', '
+        out.write('{".format":"caDNAno2"%s".root":' % sep)
+        self.encodeTopLevelObj(self.root)
+        out.write(sep + '".objects":{' + ('' if self.compact else '\n '))
+        sep = ',' if self.compact else '\n,'
         i=0
         while i<len(self._objects):
-            io.write('%s"%i":'%('\n,' if i>0 else '', i))
-            self.encodeObj(self._objects[i], useRef=False)
+            out.write('%s"%i":'%(sep if i>0 else '', i))
+            self.encodeTopLevelObj(self._objects[i])
+            out.maybeFlush()
             i += 1
-        io.write('}}')
-            
+        out.write('}}')
+        out.flush()
+
     def dumps(self):
         out = StringIO()
         self.dump(out)
         return out.getvalue()
-    
+
+    def encodeTopLevelObj(self, o):
+        self.encodeObj(o, useRef=False)
+        self._lengths.clear()  # Ids can be reused once o's rep is gone
+
     def encodeNum(self, n):
         self.io.write(json.dumps(n))
     def encodeStr(self, s):
@@ -64,14 +109,14 @@ class Encoder(object):
         io.write('{')
         first = True
         self.indentLevel += 1
-        simp = self.approxStrLength(d)<50
+        newline = self.itemSeparator(d, 50)
         for k in d:
             if first:
                 first = False
             else:
                 io.write(',')
-            if not simp:
-                io.write('\n'+'\t'*self.indentLevel)
+            if newline:
+                io.write(newline)
             self.encodeObj(k, useRef=True)
             io.write(':')
             self.encodeObj(d[k], useRef=True)
@@ -82,21 +127,21 @@ class Encoder(object):
         io.write('[')
         first = True
         self.indentLevel += 1
-        simp = self.approxStrLength(a)<50
+        newline = self.itemSeparator(a, 50)
         for o in a:
             if first:
                 first = False
             else:
                 io.write(',')
-            if not simp:
-                io.write('\n'+'\t'*self.indentLevel)
+            if newline:
+                io.write(newline)
             self.encodeObj(o, useRef=True)
         self.indentLevel -= 1
         io.write(']')
     typeToOtherEncoder = {int:encodeNum, long:encodeNum,\
                           float:encodeNum, complex:encodeNum,\
-                          str:encodeStr, dict:encodeDict,\
-                          list:encodeArr, tuple:encodeArr}
+                          str:encodeStr, unicode:encodeStr,\
+                          dict:encodeDict, list:encodeArr, tuple:encodeArr}
     def encodeObj(self, o, useRef=True):
         io = self.io
         if o==None:
@@ -118,17 +163,24 @@ class Encoder(object):
         self.indentLevel += 1
         io.write('{".class":"%s"'%d[".class"])
         del d[".class"]
-        simp = self.approxStrLength(d)<30
+        newline = self.itemSeparator(d, 30)
         for k in d:
             io.write(',')
-            if not simp:
-                io.write('\n'+'\t'*self.indentLevel)
+            if newline:
+                io.write(newline)
             self.encodeObj(k, useRef=True)
             io.write(':')
             self.encodeObj(d[k], useRef=True)
         self.indentLevel -= 1
         io.write('}')
 
+    def itemSeparator(self, item, maxInlineLength):
+        """What goes before each of item's entries: nothing if it is to
+        be printed inline, otherwise a newline at the current indent"""
+        if self.compact or self.approxStrLength(item) < maxInlineLength:
+            return ''
+        return '\n' + '\t' * self.indentLevel
+
     # For formatting purposes, it is often convenient to know
     # if an array or dict should be broken over multiple lines
     # or not.
@@ -139,17 +191,22 @@ class Encoder(object):
             return 5
         if isinstance(item, (str, unicode)):
             return len(item)+2
-        if isinstance(item, (tuple, list)):
-            sublength = 0
-            for o in item:
-                sublength += self.approxStrLength(o)
-            return sublength + 2 + 2*len(item)
+        if not isinstance(item, (tuple, list, dict)):
+            return 5  # Refs, mostly
+        length = self._lengths.get(id(item), None)
+        if length != None:
+            return length
+        sublength = 0
         if isinstance(item, dict):
-            sublength = 0
             for k,v in item.iteritems():
                 sublength += self.approxStrLength(k) + self.approxStrLength(v)
-            return sublength + 2 + 3*len(item)
-        return 5  # Refs, mostly
+            length = sublength + 2 + 3*len(item)
+        else:
+            for o in item:
+                sublength += self.approxStrLength(o)
+            length = sublength + 2 + 2*len(item)
+        self._lengths[id(item)] = length
+        return length
     simpleTypes = (int, long, float, complex, str, type(None))
             
     
@@ -158,12 +215,14 @@ class Encoder(object):
     
     
 ################## Public API ####################
-def encode(root, encodeIntoStream=None):
+def encode(root, encodeIntoStream=None, compact=False):
     """Writes the serialized representation of root
     to encodeIntoStream (by calling .write('str') on
-    it many times). If encodeIntoStream is none, returns
-    the python string of the serialized representation."""
-    e = Encoder(root)
+    it, a chunk at a time). If encodeIntoStream is none, returns
+    the python string of the serialized representation.
+    compact leaves out the newlines and tabs that lay
+    out the pretty (default) form."""
+    e = Encoder(root, compact=compact)
     if encodeIntoStream==None:
         return e.dumps()
     else:
@@ -0,0 +1,121 @@
+# The MIT License
+#
+# Copyright (c) 2011 Wyss Institute at Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# http://www.opensource.org/licenses/mit-license.php
+
+"""
+idallocator.py
+"""
+from heapq import heappush, heappop, heapify
+
+
+class HelixIDAllocator(object):
+    """
+    Hands out the numbers of a part's virtual helices. Even helices get
+    even numbers and odd helices odd ones. Within a parity a request is
+    served by the lowest number given back with recycle(), if any, and
+    otherwise by the next number past the highest one handed out so far
+    (see skipPast). reserve() can also ask for a particular number, as
+    undo, redo and file loading do.
+
+    Every operation takes O(log n) amortized time. Numbers given back go
+    on a heap per parity, which holds each number at most once. Reserving
+    one of them by number leaves its heap entry behind, stale, to be
+    discarded when it surfaces; once stale entries make up most of a heap
+    it is compacted, so undoing and redoing helix creation over and over
+    doesn't grow the heaps.
+    """
+    _minStaleToCompact = 16
+
+    def __init__(self):
+        self._used = set()
+        self._recycled = ([], [])  # Heaps of even and odd numbers
+        self._inHeap = (set(), set())  # The contents of each heap
+        self._stale = [0, 0]  # Heap entries that are in _used again
+        self._next = [0, 1]  # The next fresh even and odd number
+
+    def __contains__(self, num):
+        return num in self._used
+
+    def __len__(self):
+        return len(self._used)
+
+    def reserve(self, parityEven=True, requestedNum=None):
+        """Reserves and returns requestedNum, or the preferred free number
+        of the given parity if it is None"""
+        used = self._used
+        if requestedNum != None:
+            assert requestedNum >= 0
+            parity = requestedNum % 2
+            if requestedNum not in used and\
+               requestedNum in self._inHeap[parity]:
+                self._stale[parity] += 1
+            used.add(requestedNum)
+            self._compactIfStale(parity)
+            return requestedNum
+        parity = 0 if parityEven else 1
+        recycled, inHeap = self._recycled[parity], self._inHeap[parity]
+        while recycled:
+            num = heappop(recycled)
+            inHeap.remove(num)
+            if num in used:  # Reserved by number since
+                self._stale[parity] -= 1
+            else:
+                used.add(num)
+                return num
+        num = self._next[parity]
+        while num in used:
+            num += 2
+        self._next[parity] = num + 2
+        used.add(num)
+        return num
+
+    def recycle(self, num):
+        """Gives num back. It must not be used by any helix any more."""
+        parity = num % 2
+        wasUsed = num in self._used
+        self._used.discard(num)
+        if num in self._inHeap[parity]:
+            if wasUsed:  # Its stale entry is good again
+                self._stale[parity] -= 1
+        else:
+            heappush(self._recycled[parity], num)
+            self._inHeap[parity].add(num)
+
+    def skipPast(self, num):
+        """Fresh numbers of num's parity will be greater than num"""
+        parity = num % 2
+        self._next[parity] = max(self._next[parity], num + 2)
+
+    def heapSize(self):
+        """Entries, stale or not, in the heaps of recycled numbers"""
+        return sum(len(heap) for heap in self._recycled)
+
+    def _compactIfStale(self, parity):
+        stale, heap = self._stale[parity], self._recycled[parity]
+        if stale < self._minStaleToCompact or 2 * stale <= len(heap):
+            return
+        heap[:] = [num for num in heap if num not in self._used]
+        heapify(heap)
+        self._inHeap[parity].clear()
+        self._inHeap[parity].update(heap)
+        self._stale[parity] = 0
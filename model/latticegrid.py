@@ -0,0 +1,89 @@
+# The MIT License
+#
+# Copyright (c) 2011 Wyss Institute at Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# http://www.opensource.org/licenses/mit-license.php
+
+"""
+latticegrid.py
+"""
+
+
+class LatticeGrid(object):
+    """
+    A dense rows x cols table of the helices of a part by (row, col), for
+    lattices big enough that hashing coordinate tuples shows. Slots are
+    None where there is no helix. The grid grows to take a helix placed
+    outside it, and never shrinks past the helices it holds.
+    """
+    __slots__ = ('_rows', '_cols', '_slots')
+
+    def __init__(self, rows, cols):
+        self._rows, self._cols = max(rows, 0), max(cols, 0)
+        self._slots = [None] * (self._rows * self._cols)
+
+    def dimensions(self):
+        return (self._rows, self._cols)
+
+    def get(self, row, col):
+        """The helix at (row, col), or None"""
+        if 0 <= row < self._rows and 0 <= col < self._cols:
+            return self._slots[row * self._cols + col]
+        return None
+
+    def set(self, row, col, vh):
+        """Puts vh (or None) at (row, col)"""
+        if row < 0 or col < 0:
+            raise IndexError("LatticeGrid has no slot at (%i, %i)" % (row, col))
+        if row >= self._rows or col >= self._cols:
+            if vh == None:
+                return
+            self.resize(max(row + 1, self._rows), max(col + 1, self._cols))
+        self._slots[row * self._cols + col] = vh
+
+    def resize(self, rows, cols):
+        """Makes the grid rows x cols, or as near as it can get without
+        dropping any helix"""
+        oldRows, oldCols, old = self._rows, self._cols, self._slots
+        for i, vh in enumerate(old):
+            if vh != None:
+                rows = max(rows, i // oldCols + 1)
+                cols = max(cols, i % oldCols + 1)
+        if (rows, cols) == (oldRows, oldCols):
+            return
+        slots = [None] * (rows * cols)
+        keep = min(cols, oldCols)
+        for r in range(min(rows, oldRows)):
+            slots[r * cols:r * cols + keep] =\
+                                    old[r * oldCols:r * oldCols + keep]
+        self._rows, self._cols, self._slots = rows, cols, slots
+
+    def region(self, startRow, endRow, startCol, endCol):
+        """The helices in rows startRow to endRow and columns startCol to
+        endCol (inclusive), row by row"""
+        startRow, startCol = max(startRow, 0), max(startCol, 0)
+        endRow, endCol = min(endRow, self._rows - 1), min(endCol, self._cols - 1)
+        slots, cols, ret = self._slots, self._cols, []
+        for r in range(startRow, endRow + 1):
+            ret.extend(vh for vh in\
+                       slots[r * cols + startCol:r * cols + endCol + 1]\
+                       if vh != None)
+        return ret
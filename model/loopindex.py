@@ -0,0 +1,147 @@
+# The MIT License
+#
+# Copyright (c) 2011 Wyss Institute at Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# http://www.opensource.org/licenses/mit-license.php
+
+"""
+loopindex.py
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+
+
+class LoopIndex(object):
+    """
+    The loops and skips of one strand of a VirtualHelix, as a mapping
+    { index: count } where a positive count is a loop of that many extra
+    bases and a negative count is a skip. It supports the handful of
+    dict operations the rest of cadnano uses on it, but is stored as
+    sorted arrays of positions and counts next to their prefix sums, so
+    that the nucleotide position of a lattice index (nucleotideOffset)
+    and the nucleotide length of a range of indices (nucleotideCount)
+    each take a pair of bisections. Installing a loop costs O(#loops).
+    """
+    def __init__(self, loops=None):
+        super(LoopIndex, self).__init__()
+        self._positions = array('i')
+        self._counts = array('i')
+        self._prefixSums = array('i', [0])  # [k] = sum(self._counts[:k])
+        if loops:
+            for index, count in sorted(loops.iteritems()):
+                self._positions.append(index)
+                self._counts.append(count)
+                self._prefixSums.append(self._prefixSums[-1] + count)
+
+    def copy(self):
+        ret = LoopIndex()
+        ret._positions = array('i', self._positions)
+        ret._counts = array('i', self._counts)
+        ret._prefixSums = array('i', self._prefixSums)
+        return ret
+
+    ########################### Mapping ###########################
+    def __len__(self):
+        return len(self._positions)
+
+    def _find(self, index):
+        """The position of index in self._positions, or -1"""
+        k = bisect_left(self._positions, index)
+        if k < len(self._positions) and self._positions[k] == index:
+            return k
+        return -1
+
+    def __contains__(self, index):
+        return self._find(index) >= 0
+
+    def __getitem__(self, index):
+        k = self._find(index)
+        if k < 0:
+            raise KeyError(index)
+        return self._counts[k]
+
+    def get(self, index, default=None):
+        k = self._find(index)
+        return self._counts[k] if k >= 0 else default
+
+    def __setitem__(self, index, count):
+        k = bisect_left(self._positions, index)
+        if k < len(self._positions) and self._positions[k] == index:
+            self._counts[k] = count
+        else:
+            self._positions.insert(k, index)
+            self._counts.insert(k, count)
+            self._prefixSums.insert(k + 1, 0)
+        self._updatePrefixSums(k)
+
+    def __delitem__(self, index):
+        k = self._find(index)
+        if k < 0:
+            raise KeyError(index)
+        del self._positions[k]
+        del self._counts[k]
+        del self._prefixSums[k + 1]
+        self._updatePrefixSums(k)
+
+    def removeFrom(self, index):
+        """Removes the loops and skips at index and beyond (as when the
+        strand is truncated to index bases) and returns them as a list
+        of (index, count)"""
+        k = bisect_left(self._positions, index)
+        ret = zip(self._positions[k:], self._counts[k:])
+        del self._positions[k:]
+        del self._counts[k:]
+        del self._prefixSums[k + 1:]
+        return ret
+
+    def _updatePrefixSums(self, k):
+        prefixSums, counts = self._prefixSums, self._counts
+        for j in xrange(k, len(counts)):
+            prefixSums[j + 1] = prefixSums[j] + counts[j]
+
+    def __iter__(self):
+        return iter(self._positions)
+
+    def keys(self):
+        return list(self._positions)
+
+    def iteritems(self):
+        return iter(zip(self._positions, self._counts))
+
+    def items(self):
+        return zip(self._positions, self._counts)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+    ########################### Queries ###########################
+    def nucleotideOffset(self, index):
+        """The number of nucleotides that come before the base at index,
+        counting from index 0"""
+        return index + self._prefixSums[bisect_left(self._positions, index)]
+
+    def nucleotideCount(self, startIndex, endIndex):
+        """The number of nucleotides in the bases from startIndex to
+        endIndex inclusive"""
+        lo = bisect_left(self._positions, startIndex)
+        hi = bisect_right(self._positions, endIndex)
+        return endIndex - startIndex + 1 +\
+               self._prefixSums[hi] - self._prefixSums[lo]
@@ -0,0 +1,354 @@
+# The MIT License
+#
+# Copyright (c) 2011 Wyss Institute at Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# http://www.opensource.org/licenses/mit-license.php
+"""
+oligoindex.py
+"""
+from array import array
+
+
+class Oligo(object):
+    """
+    A maximal run of connected bases, eg a staple or the scaffold, as
+    tracked by OligoIndex. For a circular oligo the ends are the two bases
+    whose link closed the loop.
+    """
+    __slots__ = ('_color', '_length', '_5pEnd', '_3pEnd', '_isCircular')
+
+    def __init__(self, fivePrimeEnd, threePrimeEnd, length, color):
+        self._5pEnd = fivePrimeEnd
+        self._3pEnd = threePrimeEnd
+        self._length = length
+        self._color = color
+        self._isCircular = False
+
+    def __repr__(self):
+        return "Oligo(%r...%r len=%i)" % (self._5pEnd, self._3pEnd,\
+                                          self._length)
+
+    def color(self):
+        return self._color
+
+    def length(self):
+        """Number of bases (not counting loops or skips)"""
+        return self._length
+
+    def fivePrimeEnd(self):
+        return self._5pEnd
+
+    def threePrimeEnd(self):
+        return self._3pEnd
+
+    def isCircular(self):
+        return self._isCircular
+
+    def strandType(self):
+        return self._5pEnd._strandtype
+
+
+class OligoIndex(object):
+    """
+    Tracks which oligo every non-empty base belongs to, along with the
+    color, length and ends of each oligo, so that none of them require
+    following 5'/3' pointers.
+
+    Each StrandArray stores an oligo id per base (-1 for empty bases). Ids
+    form a union-find forest: joining two oligos parents the smaller one to
+    the larger, so existing bases never need relabeling on a merge. Breaking
+    an oligo walks both halves in lockstep from the break and relabels only
+    the shorter one. Base._set3Prime and Base._set5Prime report every full
+    link change through link() and unlink(). Wholesale edits that bypass
+    them (archive loading, truncating helices) call invalidate() instead
+    and the index is rebuilt from the links the next time it is queried.
+
+    Merges and splits leave dead ids behind (children of a merge, the
+    oligos of bases emptied since). Whenever the number of ids doubles,
+    the index checks whether most of them are dead and, if so, renumbers
+    the live oligos densely (see _compact), so that a long editing
+    session doesn't grow it without bound.
+    """
+    _minIdsToCompact = 1024
+
+    def __init__(self, helicesFn):
+        super(OligoIndex, self).__init__()
+        # Returns every VirtualHelix whose bases the receiver indexes
+        self._helicesFn = helicesFn
+        self._parent = []  # oligo id -> parent oligo id (self if a root)
+        self._oligos = []  # oligo id -> Oligo if the id is a root else None
+        self._valid = True
+        self._compactAt = self._minIdsToCompact  # See _compactIfSparse
+
+    def invalidate(self):
+        self._valid = False
+
+    def _ensureValid(self):
+        if not self._valid:
+            self.rebuild()
+
+    ############################# Queries #############################
+    def oligoOf(self, base):
+        """Returns the Oligo containing base or None if base is empty"""
+        self._ensureValid()
+        oid = base._strandArray()._oligo[base._n]
+        if oid < 0:
+            return None
+        return self._oligos[self._find(oid)]
+
+    def oligos(self, strandType=None):
+        self._ensureValid()
+        return [o for o in self._oligos if o != None and\
+                (strandType == None or o.strandType() == strandType)]
+
+    def colorOf(self, base):
+        o = self.oligoOf(base)
+        return o._color if o != None else None
+
+    def setColor(self, base, colorName):
+        """Colors the whole oligo containing base"""
+        o = self.oligoOf(base)
+        if o != None:
+            o._color = colorName
+
+    ############################# Union-Find #############################
+    def _find(self, oid):
+        parent = self._parent
+        root = oid
+        while parent[root] != root:
+            root = parent[root]
+        while parent[oid] != root:  # Path compression
+            parent[oid], oid = root, parent[oid]
+        return root
+
+    def _newOligo(self, fivePrimeEnd, threePrimeEnd, length, color):
+        oid = len(self._parent)
+        self._parent.append(oid)
+        self._oligos.append(Oligo(fivePrimeEnd, threePrimeEnd, length, color))
+        return oid
+
+    def _idOf(self, base):
+        return base._strandArray()._oligo[base._n]
+
+    def _setId(self, base, oid):
+        base._strandArray()._oligo[base._n] = oid
+
+    def _sameIndex(self, a, b):
+        """Links between helices indexed elsewhere (eg detached helices
+        that aren't in a part yet) can't be tracked incrementally"""
+        other = b._vhelix.oligoIndex()
+        if other is self:
+            return True
+        self.invalidate()
+        other.invalidate()
+        return False
+
+    ############################# Incremental Updates #############################
+    def link(self, fromBase, toBase):
+        """fromBase's 3' pointer was just connected to toBase"""
+        if not self._valid or not self._sameIndex(fromBase, toBase):
+            return
+        self._compactIfSparse()
+        ia, ib = self._idOf(fromBase), self._idOf(toBase)
+        if ia < 0:
+            ia = self._newOligo(fromBase, fromBase, 1, None)
+            self._setId(fromBase, ia)
+        if ib < 0:
+            ib = self._newOligo(toBase, toBase, 1, None)
+            self._setId(toBase, ib)
+        ra, rb = self._find(ia), self._find(ib)
+        oa, ob = self._oligos[ra], self._oligos[rb]
+        if ra == rb:  # Closed a loop
+            oa._isCircular = True
+            oa._5pEnd, oa._3pEnd = toBase, fromBase
+            return
+        # The 5' oligo's color wins
+        color = oa._color if oa._color != None else ob._color
+        fivePrimeEnd, threePrimeEnd = oa._5pEnd, ob._3pEnd
+        length = oa._length + ob._length
+        root, child = (ra, rb) if oa._length >= ob._length else (rb, ra)
+        self._parent[child] = root
+        self._oligos[child] = None
+        o = self._oligos[root]
+        o._5pEnd, o._3pEnd = fivePrimeEnd, threePrimeEnd
+        o._length, o._color = length, color
+
+    def unlink(self, fromBase, toBase):
+        """fromBase's 3' pointer to toBase was just cleared"""
+        if not self._valid or not self._sameIndex(fromBase, toBase):
+            return
+        self._compactIfSparse()
+        ia = self._idOf(fromBase)
+        if ia < 0 or self._idOf(toBase) < 0:
+            self.invalidate()  # The index missed a link somewhere
+            return
+        root = self._find(ia)
+        o = self._oligos[root]
+        if o._isCircular:
+            o._isCircular = False
+            o._5pEnd, o._3pEnd = toBase, fromBase
+        else:
+            # Walk upstream from fromBase and downstream from toBase in
+            # lockstep; whichever side ends first is the shorter piece
+            upstream, downstream = [], []
+            up = self._chain(fromBase, toward3p=False)
+            down = self._chain(toBase, toward3p=True)
+            while True:
+                b = next(up, None)
+                if b == None:
+                    piece, pieceIs5p = upstream, True
+                    break
+                upstream.append(b)
+                b = next(down, None)
+                if b == None:
+                    piece, pieceIs5p = downstream, False
+                    break
+                downstream.append(b)
+            if pieceIs5p:
+                oid = self._newOligo(o._5pEnd, fromBase, len(piece), o._color)
+                o._5pEnd = toBase
+            else:
+                oid = self._newOligo(toBase, o._3pEnd, len(piece), o._color)
+                o._3pEnd = fromBase
+            o._length -= len(piece)
+            for b in piece:
+                self._setId(b, oid)
+        # A base left with no links at all no longer belongs to an oligo
+        for b in (fromBase, toBase):
+            if b.isEmpty():
+                r = self._find(self._idOf(b))
+                self._oligos[r] = None
+                self._setId(b, -1)
+
+    def _compactIfSparse(self):
+        """Renumbers the oligos densely if ids have doubled since the last
+        check and most of them are dead. Only call this between updates,
+        when no ids are held in local variables."""
+        if len(self._parent) < self._compactAt:
+            return
+        numLive = len(self._oligos) - self._oligos.count(None)
+        if 2 * numLive < len(self._parent):
+            self._compact()
+        self._compactAt = max(self._minIdsToCompact, 2 * len(self._parent))
+
+    def _compact(self):
+        """Gives every live oligo a new id in 0...n-1, keeping the Oligo
+        objects (and so their ends and colors) as they are. The per-base
+        ids are rewritten through a table from every old id to the new id
+        of its root, a chunk at a time (see _SparseArray.mapValues).
+        Unlike rebuild this doesn't follow the runs of linked bases: link()
+        and unlink() are called while the links are partway through a
+        change, when the runs needn't match the index yet."""
+        parent, oligos = [], []
+        newIds = [-1] * len(self._parent)
+        for oid, o in enumerate(self._oligos):
+            if o != None and self._parent[oid] == oid:
+                newIds[oid] = len(parent)
+                parent.append(len(parent))
+                oligos.append(o)
+        for oid in xrange(len(newIds)):
+            newIds[oid] = newIds[self._find(oid)]
+        for vh in self._helicesFn():
+            for strand in (vh._scaffoldBases, vh._stapleBases):
+                strand._oligo.mapValues(newIds)
+        self._parent, self._oligos = parent, oligos
+
+    def _chain(self, base, toward3p):
+        while base != None:
+            yield base
+            base = base._3pBase if toward3p else base._5pBase
+
+    ############################# Rebuilding #############################
+    def endColors(self):
+        """Maps the end bases of every colored oligo to its color"""
+        self._ensureValid()
+        return self._endColors()
+
+    def _endColors(self):
+        endColors = {}
+        for o in self._oligos:
+            if o != None and o._color != None:
+                endColors[o._5pEnd] = o._color
+                endColors[o._3pEnd] = o._color
+        return endColors
+
+    def rebuild(self, endColors=None):
+        """Relabels every base from scratch by walking the links, a run of
+        sequentially linked bases at a time (see StrandArray._runs).
+        Oligos keep their color as long as one of their ends survived (or,
+        if endColors is given, take the color endColors has for one of
+        their ends)."""
+        if endColors == None:
+            endColors = self._endColors()
+        self._parent, self._oligos = [], []
+        self._valid = True
+        self._compactAt = self._minIdsToCompact
+        strands, runsAt = [], {}  # strand -> {end index of a run: run}
+        for vh in self._helicesFn():
+            for strand in (vh._scaffoldBases, vh._stapleBases):
+                strand._resetOligoIds()
+                runs = strand._runs()
+                strands.append((strand, runs))
+                runsAt[strand] = ends = dict((r[0], r) for r in runs)
+                ends.update((r[1], r) for r in runs)
+
+        def runOf(base):
+            strand = base._strandArray()
+            return strand, runsAt[strand][base._n]
+
+        for strand, runs in strands:
+            ids = strand._oligo
+            for run in runs:
+                if ids[run[0]] >= 0:
+                    continue
+                # Back up to the 5'-most run (or all the way around a loop)
+                firstStrand, firstRun = strand, run
+                b = strand.get5pBase(run[2])
+                while b != None:
+                    s, r = runOf(b)
+                    if r is run and s is strand:
+                        break
+                    firstStrand, firstRun = s, r
+                    b = s.get5pBase(r[2])
+                isCircular = b != None
+                oid = self._newOligo(None, None, 0, None)
+                o = self._oligos[oid]
+                if isCircular:  # Ends where the 5' walk started, as before
+                    start = strand[run[0]]
+                    fivePrimeEnd, threePrimeEnd = start._3pBase, start
+                else:
+                    fivePrimeEnd = firstStrand[firstRun[2]]
+                length, s, r = 0, firstStrand, firstRun
+                while True:
+                    lo, hi = r[0], r[1]
+                    s._oligo.setRange(lo, array('i', [oid]) * (hi - lo + 1))
+                    length += hi - lo + 1
+                    b = s.get3pBase(r[3])
+                    if b == None:
+                        threePrimeEnd = s[r[3]]
+                        break
+                    s, r = runOf(b)
+                    if r is firstRun and s is firstStrand:
+                        break
+                o._5pEnd, o._3pEnd = fivePrimeEnd, threePrimeEnd
+                o._length, o._isCircular = length, isCircular
+                o._color = endColors.get(fivePrimeEnd,\
+                                         endColors.get(threePrimeEnd, None))
@@ -0,0 +1,166 @@
+# The MIT License
+#
+# Copyright (c) 2011 Wyss Institute at Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# http://www.opensource.org/licenses/mit-license.php
+
+"""
+sequence.py
+"""
+from string import maketrans
+from .enum import StrandType
+
+# Unassigned nucleotides are '?' and stay '?' when complemented
+_complement = maketrans('ACGTUNacgtun?', 'TGCAANtgcaan?')
+
+
+def oligoRuns(oligo):
+    """
+    Yields (vhelix, strandType, lo, hi, ascending) for each run of
+    sequentially linked bases of oligo, in order from its 5' end to its 3'
+    end. [lo, hi] is the inclusive index range of the run and ascending
+    says whether the run heads 3'-ward up in index. A circular oligo is
+    walked once around, starting at fivePrimeEnd().
+    """
+    start = oligo.fivePrimeEnd()
+    return runsFrom(start.vhelix(), oligo.strandType(), start._n)
+
+
+def runsFrom(startVH, strandType, startIdx):
+    """oligoRuns for the oligo whose 5' end (or, if it is circular, any
+    base) is at startIdx on startVH; doesn't need the OligoIndex"""
+    vh, i = startVH, startIdx
+    while True:
+        strand = vh._strand(strandType)
+        ascending = vh.directionOfStrandIs5to3(strandType)
+        j = strand.runEnd(i, ascending)
+        if vh is startVH and i != startIdx and\
+           (i < startIdx <= j if ascending else j <= startIdx < i):
+            j = startIdx - 1 if ascending else startIdx + 1  # Back around
+        yield vh, strandType, min(i, j), max(i, j), ascending
+        slot = strand._3pHelix[j]
+        if slot < 0:
+            return
+        vh, i = strand._helices[slot], strand._3pIndex[j]
+        if vh is startVH and i == startIdx:
+            return
+
+
+class SequenceMap(object):
+    """
+    The nucleotide sequence assigned to the bases of a DNAPart. Each
+    strand of each helix gets a bytearray with one character per
+    nucleotide, so loops take more than one and skips none (see
+    LoopIndex.nucleotideOffset). Within the array nucleotides are in
+    ascending index order regardless of the direction of the strand,
+    which lines the scaffold and staple arrays of a helix up so that the
+    staples can be derived by complementing a whole helix at a time.
+
+    The map is a snapshot: it describes the design as it was when the
+    sequence was applied and is not updated by later edits.
+    """
+    def __init__(self, part):
+        super(SequenceMap, self).__init__()
+        self._part = part
+        self._strands = {}  # (VirtualHelix, strandType) -> bytearray
+
+    def part(self):
+        return self._part
+
+    def _strandSequence(self, vh, strandType):
+        seq = self._strands.get((vh, strandType), None)
+        if seq == None:
+            n = vh.nucleotideCount(strandType, 0, vh.numBases() - 1)
+            seq = self._strands[(vh, strandType)] = bytearray('?' * n)
+        return seq
+
+    ############################# Applying #############################
+    def applyScaffoldSequence(self, sequence, oligo):
+        """Writes sequence along the scaffold oligo from its 5' end, one
+        run of linked bases at a time. Bases past the end of sequence are
+        left as '?'."""
+        sequence = str(sequence)
+        pos = 0
+        for vh, strandType, lo, hi, ascending in oligoRuns(oligo):
+            loops = vh._loop(strandType)
+            n = loops.nucleotideCount(lo, hi)
+            chunk = sequence[pos:pos + n]
+            pos += n
+            if len(chunk) < n:
+                chunk += '?' * (n - len(chunk))
+            offset = loops.nucleotideOffset(lo)
+            seq = self._strandSequence(vh, strandType)
+            seq[offset:offset + n] = chunk if ascending else chunk[::-1]
+
+    def deriveStapleSequences(self):
+        """Gives every staple base the complement of the scaffold base it
+        pairs with. A helix whose strands have the same loops and skips is
+        complemented in a single pass; otherwise bases whose nucleotide
+        counts disagree are left as '?'."""
+        for vh in self._part.getVirtualHelices():
+            scaf = self._strandSequence(vh, StrandType.Scaffold)
+            scafLoops = vh._loop(StrandType.Scaffold)
+            stapLoops = vh._loop(StrandType.Staple)
+            if scafLoops.items() == stapLoops.items():
+                self._strands[(vh, StrandType.Staple)] =\
+                                    scaf.translate(_complement)
+                continue
+            stap = self._strandSequence(vh, StrandType.Staple)
+            for i in xrange(vh.numBases()):
+                n = scafLoops.nucleotideCount(i, i)
+                if n != stapLoops.nucleotideCount(i, i):
+                    continue
+                src = scafLoops.nucleotideOffset(i)
+                dst = stapLoops.nucleotideOffset(i)
+                stap[dst:dst + n] = scaf[src:src + n].translate(_complement)
+
+    ############################# Queries #############################
+    def sequenceAt(self, vh, strandType, index):
+        """The nucleotides of the base at index, 5' to 3'"""
+        seq = self._strands.get((vh, strandType), None)
+        loops = vh._loop(strandType)
+        n = loops.nucleotideCount(index, index)
+        if seq == None:
+            return '?' * n
+        offset = loops.nucleotideOffset(index)
+        ret = str(seq[offset:offset + n])
+        return ret if vh.directionOfStrandIs5to3(strandType) else ret[::-1]
+
+    def runSequence(self, vh, strandType, lo, hi, ascending):
+        """The sequence of a run of bases as yielded by oligoRuns, 5' to
+        3'"""
+        loops = vh._loop(strandType)
+        n = loops.nucleotideCount(lo, hi)
+        seq = self._strands.get((vh, strandType), None)
+        if seq == None:
+            return '?' * n
+        offset = loops.nucleotideOffset(lo)
+        chunk = str(seq[offset:offset + n])
+        return chunk if ascending else chunk[::-1]
+
+    def oligoSequence(self, oligo):
+        """The sequence of oligo, 5' to 3'"""
+        return ''.join(self.runSequence(*run) for run in oligoRuns(oligo))
+
+    def stapleSequences(self):
+        """[(oligo, sequence)] for every staple of the part"""
+        return [(o, self.oligoSequence(o))\
+                for o in self._part.getOligos(StrandType.Staple)]
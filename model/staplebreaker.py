@@ -0,0 +1,273 @@
+# The MIT License
+#
+# Copyright (c) 2011 Wyss Institute at Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# http://www.opensource.org/licenses/mit-license.php
+
+"""
+staplebreaker.py
+"""
+import multiprocessing
+import time
+from array import array
+from .enum import StrandType
+from .sequence import oligoRuns
+
+
+def _bestBreaks(description):
+    """
+    Works out where to break one oligo, given its compact description
+    (see StapleBreaker._describe). Returns the indices of the chosen
+    candidates in ascending order, () if the oligo needs no breaks, or
+    None if no choice of candidates gives pieces of acceptable length.
+    Runs in StapleBreaker's worker processes, so it only sees ints and
+    arrays.
+    """
+    length, isCircular, offsets, penalties, minLength, maxLength, target =\
+                                                                description
+    n = len(offsets)
+    if not isCircular:
+        if length <= maxLength:
+            return ()
+        best = _cheapestCuts(offsets, penalties, length, 0,\
+                             minLength, maxLength, target)
+        return None if best == None else best[1]
+    # Any acceptable way of cutting a circle cuts it somewhere in every
+    # stretch maxLength long, so one of the candidates in the stretch with
+    # the fewest of them is among the cuts. Try each as the first cut and
+    # straighten the circle out from there.
+    if n == 0:
+        return None
+    window, end = range(n), 0
+    for a in range(n):
+        end = max(end, a)
+        while end + 1 < a + n and\
+              offsets[(end + 1) % n] + (end + 1) // n * length <\
+              offsets[a] + maxLength:
+            end += 1
+        if end - a + 1 < len(window):
+            window = range(a, end + 1)
+    best = None
+    for first in window:
+        first %= n
+        start = offsets[first]
+        order = range(first + 1, n) + range(first)
+        positions = [(offsets[k] - start) % length for k in order]
+        result = _cheapestCuts(positions, [penalties[k] for k in order],\
+                               length, penalties[first],\
+                               minLength, maxLength, target)
+        if result != None and (best == None or result[0] < best[0]):
+            best = (result[0], sorted([first] + [order[k] for k in result[1]]))
+    return None if best == None else best[1]
+
+
+def _cheapestCuts(positions, penalties, length, endPenalty,\
+                  minLength, maxLength, target):
+    """
+    The cheapest way of cutting [0, length] at some of the ascending
+    positions so that every piece is minLength to maxLength long. A piece
+    costs the square of its distance from target and the cut at
+    positions[k] costs penalties[k] (the end, endPenalty). Returns
+    (cost, indices of the cuts) or None if there is no way.
+    """
+    n = len(positions)
+    points = [0] + list(positions) + [length]
+    unreachable = float('inf')
+    costs = [unreachable] * (n + 2)
+    costs[0] = 0
+    previous = [-1] * (n + 2)
+    lo = 0  # The first point within maxLength of the current one
+    for j in xrange(1, n + 2):
+        pj = points[j]
+        while pj - points[lo] > maxLength:
+            lo += 1
+        best, bestI = unreachable, -1
+        for i in xrange(lo, j):
+            d = pj - points[i]
+            if d < minLength:
+                break
+            c = costs[i] + (d - target) * (d - target)
+            if c < best:
+                best, bestI = c, i
+        if bestI >= 0:
+            costs[j] = best + (penalties[j - 1] if j <= n else endPenalty)
+            previous[j] = bestI
+    if costs[n + 1] == unreachable:
+        return None
+    cuts = []
+    j = previous[n + 1]
+    while j > 0:
+        cuts.append(j - 1)
+        j = previous[j]
+    cuts.reverse()
+    return costs[n + 1], cuts
+
+
+class StapleBreaker(object):
+    """
+    Breaks the long staple oligos of a part (such as the ones autoStaple
+    leaves behind) into pieces minLength to maxLength nucleotides long,
+    as close to targetLength (by default halfway between) as it can.
+
+    A break goes between two consecutive bases of a helix, never on a
+    crossover nor within minXoverDistance bases of one, and each base
+    short of preferredXoverDistance adds shortDomainPenalty to its cost,
+    so that the pieces keep a decent stretch of bases on each helix they
+    visit. The oligos are independent, so each one is reduced to a
+    compact description (nucleotide offsets and penalties of the places
+    it could break) and the descriptions are solved by dynamic
+    programming in a multiprocessing pool. All of the breaks are then
+    applied as one undo step.
+    """
+    def __init__(self, part, minLength=18, maxLength=60, targetLength=None,\
+                 minXoverDistance=3, preferredXoverDistance=7,\
+                 shortDomainPenalty=64):
+        self._part = part
+        self.minLength = minLength
+        self.maxLength = maxLength
+        if targetLength == None:
+            targetLength = (minLength + maxLength) // 2
+        self.targetLength = targetLength
+        self.minXoverDistance = minXoverDistance
+        self.preferredXoverDistance = preferredXoverDistance
+        self.shortDomainPenalty = shortDomainPenalty
+        # Filled in by run()
+        self.oligosExamined = 0
+        self.oligosBroken = 0
+        self.breaks = 0
+        self.unbreakable = []
+        self.seconds = 0.0
+        self.processes = 0
+
+    def part(self):
+        return self._part
+
+    def oligosPerSecond(self):
+        """Throughput of the last run(): staple oligos described and solved
+        (those that are circular or too long) per second spent on them"""
+        if not self.seconds:
+            return 0.0
+        return self.oligosExamined / self.seconds
+
+    def summary(self):
+        return "%i breaks in %i of %i long or circular staples "\
+               "(%i unbreakable), %.0f oligos/s on %i process%s" %\
+               (self.breaks, self.oligosBroken, self.oligosExamined,\
+                len(self.unbreakable), self.oligosPerSecond(),\
+                self.processes, "" if self.processes == 1 else "es")
+
+    def run(self, processes=None):
+        """
+        Breaks the part's staples as one undo step, using a pool of
+        processes (by default one per CPU; 1 solves everything in this
+        process). Returns the number of breaks made. The oligos that
+        can't be broken into acceptable pieces are left alone and listed
+        in self.unbreakable.
+        """
+        start = time.time()
+        oligos, descriptions, sites = [], [], []
+        for o in self._part.getOligos(StrandType.Staple):
+            if o.isCircular() or o.length() > self.maxLength:
+                description, oligoSites = self._describe(o)
+                oligos.append(o)
+                descriptions.append(description)
+                sites.append(oligoSites)
+        self.oligosExamined = len(descriptions)
+        if processes == None:
+            processes = multiprocessing.cpu_count()
+        processes = max(1, min(processes, len(descriptions)))
+        if processes == 1:
+            results = map(_bestBreaks, descriptions)
+        else:
+            pool = multiprocessing.Pool(processes)
+            try:
+                chunk = max(1, len(descriptions) // (4 * processes))
+                results = pool.map(_bestBreaks, descriptions, chunk)
+            finally:
+                pool.close()
+                pool.join()
+        self.seconds = time.time() - start
+        self.processes = processes
+
+        st = StrandType.Staple
+        commands = []
+        self.unbreakable = []
+        self.oligosBroken = 0
+        for o, cuts, oligoSites in zip(oligos, results, sites):
+            if cuts == None:
+                self.unbreakable.append(o)
+                continue
+            if cuts:
+                self.oligosBroken += 1
+            for k in cuts:  # From the 5' end, so each split is short
+                vh, index = oligoSites[k]
+                commands.append(vh.Break3To5Command(st, vh, index))
+        self.breaks = len(commands)
+        if commands:
+            part = self._part
+            part.undoStack().push(part.MacroCommand(part, "Break staples",\
+                                                    commands))
+        return self.breaks
+
+    def _describe(self, oligo):
+        """
+        Returns (description, sites) for oligo. The description is what
+        _bestBreaks needs: (length in nucleotides, isCircular, the
+        nucleotide offset of each place it could break, counted from its
+        5' end, the cost of breaking there, minLength, maxLength,
+        targetLength). sites holds the (vhelix, index) of the base on the
+        5' side of each of those places, for Break3To5Command.
+        """
+        runs = list(oligoRuns(oligo))
+        isCircular = oligo.isCircular()
+        minDistance = self.minXoverDistance
+        preferred = self.preferredXoverDistance
+        penalty = self.shortDomainPenalty
+        farAway = 1 << 30
+        offsets, penalties, sites = array('i'), array('i'), []
+        position = 0
+        last = len(runs) - 1
+        for r, (vh, st, lo, hi, ascending) in enumerate(runs):
+            loops = vh._loop(st)
+            runLength = hi - lo + 1
+            xover5 = r > 0 or isCircular
+            xover3 = r < last or isCircular
+            # Break after the first m bases of the run
+            for m in xrange(1, runLength):
+                distance = min(m if xover5 else farAway,\
+                               runLength - m if xover3 else farAway)
+                if distance < minDistance:
+                    continue
+                if ascending:
+                    index = lo + m - 1
+                    nucleotides = loops.nucleotideCount(lo, index) if loops\
+                                  else m
+                else:
+                    index = hi - m + 1
+                    nucleotides = loops.nucleotideCount(index, hi) if loops\
+                                  else m
+                offsets.append(position + nucleotides)
+                penalties.append(penalty * max(0, preferred - distance))
+                sites.append((vh, index))
+            position += loops.nucleotideCount(lo, hi) if loops else runLength
+        description = (position, isCircular, offsets, penalties,\
+                       self.minLength, self.maxLength, self.targetLength)
+        return description, sites
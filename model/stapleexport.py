@@ -0,0 +1,72 @@
+# The MIT License
+#
+# Copyright (c) 2011 Wyss Institute at Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# http://www.opensource.org/licenses/mit-license.php
+
+"""
+stapleexport.py
+"""
+import csv
+from .enum import StrandType
+from .sequence import runsFrom
+
+csvHeader = ('Start', 'End', 'Sequence', 'Length', 'Color')
+
+
+def stapleRows(part):
+    """
+    Yields a (start, end, sequence, length, color) row for every staple of
+    part, with start and end written as helix[index]. Staples are found by
+    their 5' ends (circular staples have none and are skipped) in helix
+    number order and walked one run of bases at a time, so nothing is
+    kept from one row to the next. The sequence comes from the part's
+    SequenceMap ('?' where none has been applied).
+    """
+    st = StrandType.Staple
+    sm = part.sequenceMap()
+    oligoIndex = part.oligoIndex()
+    for vh in sorted(part.getVirtualHelices(), key=lambda vh: vh.number()):
+        strand = vh._strand(st)
+        for i in strand.segmentBreaks():
+            if not strand.is5primeEnd(i):
+                continue
+            chunks, length = [], 0
+            for run in runsFrom(vh, st, i):
+                runVH, runST, lo, hi, ascending = run
+                length += runVH.nucleotideCount(st, lo, hi)
+                if sm != None:
+                    chunks.append(sm.runSequence(*run))
+                end = (runVH, hi if ascending else lo)
+            sequence = ''.join(chunks) if sm != None else '?' * length
+            color = oligoIndex.colorOf(strand[i])
+            yield ('%i[%i]' % (vh.number(), i),\
+                   '%i[%i]' % (end[0].number(), end[1]),\
+                   sequence, length, color if color != None else '')
+
+
+def writeStapleCSV(parts, f):
+    """Streams the staples of every part in parts to the file-like f"""
+    writer = csv.writer(f)
+    writer.writerow(csvHeader)
+    for part in parts:
+        for row in stapleRows(part):
+            writer.writerow(row)
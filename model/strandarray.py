@@ -0,0 +1,821 @@
+# The MIT License
+#
+# Copyright (c) 2011 Wyss Institute at Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# http://www.opensource.org/licenses/mit-license.php
+"""
+strandarray.py
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+from .base import Base
+
+
+def _setMembership(sortedList, index, isMember):
+    """Inserts or removes index from sortedList by bisection"""
+    pos = bisect_left(sortedList, index)
+    present = pos < len(sortedList) and sortedList[pos] == index
+    if isMember and not present:
+        sortedList.insert(pos, index)
+    elif present and not isMember:
+        del sortedList[pos]
+
+
+_ChunkShift = 6
+_ChunkSize = 1 << _ChunkShift
+_ChunkMask = _ChunkSize - 1
+
+
+class _SparseArray(object):
+    """
+    A fixed-length stand-in for array.array that only allocates storage
+    for the stretches that hold something other than its default value.
+    Positions are kept in chunks of _ChunkSize; a chunk in which every
+    position holds the default is None, so an empty stretch of a helix
+    costs one pointer per chunk and reading it allocates nothing.
+    """
+    __slots__ = ('typecode', 'itemsize', '_default', '_len', '_chunks')
+
+    def __init__(self, typecode, default, length=0):
+        self.typecode = typecode
+        self.itemsize = array(typecode).itemsize
+        self._default = default
+        self._len = 0
+        self._chunks = []
+        self.resize(length)
+
+    def __len__(self):
+        return self._len
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self._len
+        if i >= self._len or i < 0:
+            raise IndexError("array index out of range")
+        chunk = self._chunks[i >> _ChunkShift]
+        if chunk is None:  # Not == None, which array compares elementwise
+            return self._default
+        return chunk[i & _ChunkMask]
+
+    def __setitem__(self, i, value):
+        if i < 0:
+            i += self._len
+        if not 0 <= i < self._len:
+            raise IndexError("array assignment index out of range")
+        k = i >> _ChunkShift
+        chunk = self._chunks[k]
+        default = self._default
+        if chunk is None:
+            if value == default:
+                return
+            chunk = self._chunks[k] = array(self.typecode, [default]) *\
+                                                                _ChunkSize
+        chunk[i & _ChunkMask] = value
+        if value == default and chunk.count(default) == _ChunkSize:
+            self._chunks[k] = None
+
+    def setRange(self, startIndex, values, keepSparse=True):
+        """self[startIndex + k] = values[k] for every k, a chunk at a time
+        (values is an array of the same typecode). Bulk loads that write
+        many ranges can pass keepSparse=False to skip looking for chunks
+        left all default, and call dropDefaultChunks once at the end."""
+        i, endIndex = startIndex, startIndex + len(values)
+        if startIndex < 0 or endIndex > self._len:
+            raise IndexError("array assignment index out of range")
+        default, chunks = self._default, self._chunks
+        while i < endIndex:
+            k = i >> _ChunkShift
+            nextChunk = min((k + 1) << _ChunkShift, endIndex)
+            part = values[i - startIndex:nextChunk - startIndex]
+            chunk = chunks[k]
+            if chunk is None:
+                if keepSparse and part.count(default) == len(part):
+                    i = nextChunk
+                    continue
+                chunk = chunks[k] = array(self.typecode, [default]) *\
+                                                                _ChunkSize
+            chunk[i & _ChunkMask:(i & _ChunkMask) + len(part)] = part
+            if keepSparse and chunk.count(default) == _ChunkSize:
+                chunks[k] = None
+            i = nextChunk
+
+    def clear(self):
+        """Resets every position to the default, freeing all the chunks"""
+        self._chunks = [None] * len(self._chunks)
+
+    def dropDefaultChunks(self):
+        """Frees every chunk that holds only the default value (see
+        setRange)"""
+        default, chunks = self._default, self._chunks
+        for k, chunk in enumerate(chunks):
+            if chunk is not None and chunk.count(default) == _ChunkSize:
+                chunks[k] = None
+
+    def clearRange(self, startIndex, endIndex):
+        """Resets every position in [startIndex, endIndex) to the default"""
+        self.setRange(startIndex, array(self.typecode, [self._default]) *\
+                                                    (endIndex - startIndex))
+
+    def resize(self, length):
+        """Grows with default values or truncates to length"""
+        oldLen, self._len = self._len, length
+        numChunks = (length + _ChunkMask) >> _ChunkShift
+        if length > oldLen:
+            self._chunks.extend([None] * (numChunks - len(self._chunks)))
+        elif length < oldLen:
+            del self._chunks[numChunks:]
+            tail = length & _ChunkMask
+            if tail and self._chunks[-1] is not None:
+                # Positions past the end must hold the default
+                chunk = self._chunks[-1]
+                chunk[tail:] = array(self.typecode, [self._default]) *\
+                                                        (_ChunkSize - tail)
+                if chunk.count(self._default) == _ChunkSize:
+                    self._chunks[-1] = None
+
+    def isDefaultRange(self, startIndex, endIndex):
+        """True if every position in [startIndex, endIndex) holds the
+        default value"""
+        default, chunks = self._default, self._chunks
+        i = max(startIndex, 0)
+        endIndex = min(endIndex, self._len)
+        while i < endIndex:
+            k = i >> _ChunkShift
+            nextChunk = min((k + 1) << _ChunkShift, endIndex)
+            chunk = chunks[k]
+            if chunk is not None:
+                lo, hi = i & _ChunkMask, nextChunk - (k << _ChunkShift)
+                if chunk[lo:hi].count(default) != hi - lo:
+                    return False
+            i = nextChunk
+        return True
+
+    def mapValues(self, table):
+        """self[i] = table[self[i]] for every position that doesn't hold
+        the default value, a chunk at a time"""
+        default, chunks = self._default, self._chunks
+        for k, chunk in enumerate(chunks):
+            if chunk is None:
+                continue
+            chunk = chunks[k] = array(self.typecode,\
+                        [v if v == default else table[v] for v in chunk])
+            if chunk.count(default) == _ChunkSize:
+                chunks[k] = None
+
+    def copy(self):
+        ret = _SparseArray(self.typecode, self._default)
+        ret._len = self._len
+        ret._chunks = [array(c.typecode, c) if c is not None else None\
+                       for c in self._chunks]
+        return ret
+
+    def allocatedBytes(self):
+        """Bytes of element storage actually allocated"""
+        return sum(len(c) for c in self._chunks if c is not None) *\
+               self.itemsize
+
+
+class StrandArray(object):
+    """
+    Compact storage for the bases of one strand of a VirtualHelix. Instead
+    of one Base object per position, the 5' and 3' links of every base are
+    kept as (helix slot, index) pairs in flat integer arrays, next to the
+    id of the oligo each base belongs to (see OligoIndex). Base objects are
+    lightweight views created on demand by __getitem__, so code that treats
+    a strand as a list of Base keeps working. The arrays are sparse (see
+    _SparseArray): the empty stretches that make up most of a typical
+    design take no per-base storage until something is connected there.
+
+    Links always stay on the same strand type (scaffold bases connect to
+    scaffold bases). The helix half of a link is a slot in self._helices
+    rather than a helix number so that links survive renumbering and work
+    for helices that are not attached to a part. Slot 0 is always the
+    owning helix; -1 means "no link".
+
+    The array also keeps a sorted index of its segment breaks (the positions
+    that are ends or crossovers). Every link change goes through _setLink5
+    or _setLink3, which refresh the break status of that single position by
+    bisection, so VirtualHelix.getSegments costs O(#segments) rather than
+    a walk over the whole strand. Crossovers are indexed the same way, by
+    the position of their 3' (outgoing) and 5' (incoming) ends; DNAPart
+    builds its crossover queries on top of these.
+    """
+    # Bits of the values returned by linkFlags
+    EmptyFlag, CrossoverFlag = 1, 2
+    # Bits of _flags, the state of each base as of its last link change
+    _Has5p, _Has3p = 1, 2
+    _OtherHelix5p, _OtherHelix3p = 4, 8  # Link to another helix
+    _Xover5p, _Xover3p = 16, 32  # Other helix or not adjacent
+    _HasLinks = _Has5p | _Has3p
+    _OtherHelix = _OtherHelix5p | _OtherHelix3p
+    # Kinds of the runs of linkRuns
+    RunUp, RunDown, RunExplicit = 0, 1, 2
+
+    def __init__(self, vhelix, strandType, numBases=0):
+        super(StrandArray, self).__init__()
+        self._vhelix = vhelix
+        self._strandType = strandType
+        self._helices = [vhelix]
+        self._helixToSlot = {vhelix: 0}
+        self._5pHelix = _SparseArray('h', -1)
+        self._5pIndex = _SparseArray('i', 0)
+        self._3pHelix = _SparseArray('h', -1)
+        self._3pIndex = _SparseArray('i', 0)
+        self._oligo = _SparseArray('i', -1)
+        self._flags = _SparseArray('B', 0)  # See _updateFlags
+        self._segmentBreaks = []  # sorted indices of ends and crossovers
+        self._3pXovers = []  # sorted indices with a crossover 3' link
+        self._5pXovers = []  # sorted indices with a crossover 5' link
+        self.resize(numBases)
+
+    def __len__(self):
+        return len(self._5pHelix)
+
+    def __getitem__(self, index):
+        n = len(self._5pHelix)
+        if index < 0:
+            index += n
+        if index < 0 or index >= n:
+            raise IndexError("strand index %i out of range" % index)
+        return Base(self._vhelix, self._strandType, index)
+
+    def __iter__(self):
+        vh, st = self._vhelix, self._strandType
+        return (Base(vh, st, i) for i in xrange(len(self._5pHelix)))
+
+    def _arrays(self):
+        return (self._5pHelix, self._5pIndex,\
+                self._3pHelix, self._3pIndex, self._oligo, self._flags)
+
+    def resize(self, numBases):
+        """Grows (with empty bases) or truncates the strand to numBases."""
+        oldNB = len(self._5pHelix)
+        for arr in self._arrays():
+            arr.resize(numBases)
+        if numBases < oldNB:
+            for l in self._indexLists():
+                del l[bisect_left(l, numBases):]
+            self._vhelix.oligoIndex().invalidate()
+
+    def snapshot(self):
+        """A copy of the links of every base, for restoreSnapshot"""
+        return (tuple(self._helices),) +\
+               tuple(arr.copy() for arr in self._arrays()[:4])
+
+    def restoreSnapshot(self, snap):
+        """Replaces every link with those recorded by snapshot(). Oligo
+        ids are left for the caller to recompute (see OligoIndex)."""
+        helices = snap[0]
+        self._helices = list(helices)
+        self._helixToSlot = dict((vh, i) for i, vh in enumerate(helices))
+        self._5pHelix, self._5pIndex, self._3pHelix, self._3pIndex =\
+                        (arr.copy() for arr in snap[1:])
+        self._resetOligoIds()
+        self._rebuildIndices()
+
+    def linkRuns(self):
+        """The links of the strand, run-length encoded for a binary
+        archive (see setLinkRuns), as the helices that the slots refer
+        to and a pair of arrays. The first array holds (kind, startIndex,
+        count) triples in ascending order: the bases of a RunUp or RunDown
+        run are linked to both of their neighbors, heading 3'-ward up or
+        down in index, and those of a RunExplicit run have their (5' slot,
+        5' index, 3' slot, 3' index) listed, in order, in the second array.
+        Empty bases are left out."""
+        runs, explicit = array('i'), array('i')
+        for lo, hi, fivePrimeIndex, threePrimeIndex in self._runs():
+            if hi - lo < 2:
+                self._appendExplicitRun(runs, explicit, lo, hi)
+                continue
+            self._appendExplicitRun(runs, explicit, lo, lo)
+            runs.extend((self.RunUp if fivePrimeIndex == lo else\
+                         self.RunDown, lo + 1, hi - lo - 1))
+            self._appendExplicitRun(runs, explicit, hi, hi)
+        return self._helices, runs, explicit
+
+    def _appendExplicitRun(self, runs, explicit, lo, hi):
+        for i in xrange(lo, hi + 1):
+            explicit.extend((self._5pHelix[i], self._5pIndex[i],\
+                             self._3pHelix[i], self._3pIndex[i]))
+        if runs and runs[-3] == self.RunExplicit and\
+           runs[-2] + runs[-1] == lo:
+            runs[-1] += hi - lo + 1
+        else:
+            runs.extend((self.RunExplicit, lo, hi - lo + 1))
+
+    def setLinkRuns(self, helices, runs, explicit):
+        """Replaces every link with those described by runs and explicit
+        (see linkRuns), where the slots refer to helices. The state bits
+        and sorted indices are worked out from the links rather than
+        taken on trust, and malformed runs raise ValueError. Like the
+        other wholesale edits it leaves the oligo ids to be recomputed."""
+        if not helices or helices[0] != self._vhelix:
+            raise ValueError("slot 0 must be the strand's own helix")
+        numBases, numSlots = len(self._5pHelix), len(helices)
+        for arr in self._arrays():  # Oligo ids included
+            arr.clear()
+        links5 = (self._5pHelix, self._5pIndex)
+        links3 = (self._3pHelix, self._3pIndex)
+        flags = self._flags
+        self._helices = list(helices)
+        self._helixToSlot = dict((vh, i) for i, vh in enumerate(helices))
+        breaks, xovers3, xovers5 = [], [], []
+        ends = (self._Has5p, self._Has3p)
+        hasLinks, otherHelix = self._HasLinks, self._OtherHelix
+        if len(runs) % 3 or len(explicit) % 4:
+            raise ValueError("incomplete link runs")
+        e, runEnd = 0, 0
+        for r in xrange(0, len(runs), 3):
+            kind, start, count = runs[r:r + 3]
+            if count < 1 or start < runEnd or start + count > numBases:
+                raise ValueError("link run (%i, %i) overlaps or leaves "\
+                                 "the strand" % (start, count))
+            runEnd = start + count
+            if kind == self.RunExplicit:
+                for i in xrange(start, runEnd):
+                    if e + 4 > len(explicit):
+                        raise ValueError("missing explicit links")
+                    for (helix, index), slot, n in\
+                                    ((links5, explicit[e], explicit[e + 1]),\
+                                     (links3, explicit[e + 2],\
+                                      explicit[e + 3])):
+                        if slot == -1:
+                            continue
+                        if not 0 <= slot < numSlots or\
+                           not 0 <= n < numBases:
+                            raise ValueError("link (%i, %i) of base %i "\
+                                             "leads nowhere" % (slot, n, i))
+                        helix[i], index[i] = slot, n
+                    e += 4
+                    f = self._updateFlags(i)
+                    if f & hasLinks in ends or f & otherHelix:
+                        breaks.append(i)
+                    if f & self._Xover3p:
+                        xovers3.append(i)
+                    if f & self._Xover5p:
+                        xovers5.append(i)
+            elif kind in (self.RunUp, self.RunDown):
+                if start < 1 or runEnd >= numBases:
+                    raise ValueError("link run (%i, %i) links past the "\
+                                     "ends of the strand" % (start, count))
+                slots = array('h', [0]) * count
+                lower = array('i', xrange(start - 1, runEnd - 1))
+                upper = array('i', xrange(start + 1, runEnd + 1))
+                linksUp, linksDown = (links3, links5)\
+                                if kind == self.RunUp else (links5, links3)
+                linksUp[0].setRange(start, slots, keepSparse=False)
+                linksUp[1].setRange(start, upper, keepSparse=False)
+                linksDown[0].setRange(start, slots, keepSparse=False)
+                linksDown[1].setRange(start, lower, keepSparse=False)
+                flags.setRange(start, array('B', [hasLinks]) * count,\
+                               keepSparse=False)
+            else:
+                raise ValueError("unknown kind of link run %i" % kind)
+        if e != len(explicit):
+            raise ValueError("more explicit links than explicit bases")
+        for arr in links5 + links3:
+            arr.dropDefaultChunks()
+        self._segmentBreaks, self._3pXovers, self._5pXovers =\
+                                                    breaks, xovers3, xovers5
+        self._vhelix.oligoIndex().invalidate()
+
+    def bytesPerBase(self):
+        """Bytes of link and oligo storage used by each occupied position
+        (empty stretches use none, see allocatedBytes)"""
+        return sum(arr.itemsize for arr in self._arrays())
+
+    def allocatedBytes(self):
+        return sum(arr.allocatedBytes() for arr in self._arrays())
+
+    ########################### Links ###########################
+    def _slotOf(self, vhelix):
+        slot = self._helixToSlot.get(vhelix, None)
+        if slot == None:
+            slot = len(self._helices)
+            self._helices.append(vhelix)
+            self._helixToSlot[vhelix] = slot
+        return slot
+
+    def get5pBase(self, index):
+        slot = self._5pHelix[index]
+        if slot < 0:
+            return None
+        return Base(self._helices[slot], self._strandType,\
+                    self._5pIndex[index])
+
+    def get3pBase(self, index):
+        slot = self._3pHelix[index]
+        if slot < 0:
+            return None
+        return Base(self._helices[slot], self._strandType,\
+                    self._3pIndex[index])
+
+    def _setLink5(self, index, toBase):
+        """Only Base should call this method. Sets the 5' pointer of
+        the base at index without touching toBase."""
+        if toBase == None:
+            self._5pHelix[index] = -1
+            self._5pIndex[index] = 0  # So that the chunk can be freed
+        else:
+            self._5pHelix[index] = self._slotOf(toBase._vhelix)
+            self._5pIndex[index] = toBase._n
+        flags = self._updateFlags(index)
+        _setMembership(self._5pXovers, index, flags & self._Xover5p)
+        self._updateSegmentBreak(index)
+
+    def _setLink3(self, index, toBase):
+        """Only Base should call this method. Sets the 3' pointer of
+        the base at index without touching toBase."""
+        if toBase == None:
+            self._3pHelix[index] = -1
+            self._3pIndex[index] = 0
+        else:
+            self._3pHelix[index] = self._slotOf(toBase._vhelix)
+            self._3pIndex[index] = toBase._n
+        flags = self._updateFlags(index)
+        _setMembership(self._3pXovers, index, flags & self._Xover3p)
+        self._updateSegmentBreak(index)
+
+    def _connectRun(self, startIndex, endIndex, ascending):
+        """Only VirtualHelix should call this method. Links the empty bases
+        in [startIndex, endIndex] into a single run, heading 3'-ward up in
+        index if ascending, by writing the arrays a chunk at a time rather
+        than going through a Base per position. Like the other wholesale
+        edits it leaves the oligo ids to be recomputed."""
+        assert(startIndex < endIndex)
+        assert(self.isEmptyRange(startIndex, endIndex + 1))
+        n = endIndex - startIndex
+        slots = array('h', [0]) * n
+        lower = array('i', xrange(startIndex, endIndex))
+        upper = array('i', xrange(startIndex + 1, endIndex + 1))
+        if ascending:
+            linksUp = (self._3pHelix, self._3pIndex)
+            linksDown = (self._5pHelix, self._5pIndex)
+            lowEnd, highEnd = self._Has3p, self._Has5p
+        else:
+            linksUp = (self._5pHelix, self._5pIndex)
+            linksDown = (self._3pHelix, self._3pIndex)
+            lowEnd, highEnd = self._Has5p, self._Has3p
+        linksUp[0].setRange(startIndex, slots)
+        linksUp[1].setRange(startIndex, upper)
+        linksDown[0].setRange(startIndex + 1, slots)
+        linksDown[1].setRange(startIndex + 1, lower)
+        flags = array('B', [self._HasLinks]) * (n + 1)
+        flags[0], flags[n] = lowEnd, highEnd
+        self._flags.setRange(startIndex, flags)
+        _setMembership(self._segmentBreaks, startIndex, True)
+        _setMembership(self._segmentBreaks, endIndex, True)
+        self._vhelix.oligoIndex().invalidate()
+
+    def _linksAt(self, index):
+        """Only VirtualHelix should call this method. [link5, link3] of the
+        base at index, where a link is a (vhelix, index) pair or None."""
+        ret = []
+        for helices, indices in ((self._5pHelix, self._5pIndex),\
+                                 (self._3pHelix, self._3pIndex)):
+            slot = helices[index]
+            ret.append((self._helices[slot], indices[index])\
+                       if slot >= 0 else None)
+        return ret
+
+    def _setLinksAt(self, links):
+        """Only VirtualHelix should call this method. Sets both links of
+        every base in links, a sequence of (index, link5, link3) (see
+        _linksAt), without touching the bases at the other end: the caller
+        keeps links reciprocal. The sorted indices are merged once for the
+        whole batch, and the oligo ids are left to be recomputed."""
+        changed = {}  # index -> flags
+        for index, link5, link3 in links:
+            for link, helices, indices in\
+                                    ((link5, self._5pHelix, self._5pIndex),\
+                                     (link3, self._3pHelix, self._3pIndex)):
+                if link == None:
+                    helices[index] = -1
+                    indices[index] = 0
+                else:
+                    helices[index] = self._slotOf(link[0])
+                    indices[index] = link[1]
+            changed[index] = self._updateFlags(index)
+        ends = (self._Has5p, self._Has3p)
+        hasLinks, otherHelix = self._HasLinks, self._OtherHelix
+        for l, isMember in ((self._segmentBreaks, lambda f:\
+                                f & hasLinks in ends or f & otherHelix),\
+                            (self._3pXovers, lambda f: f & self._Xover3p),\
+                            (self._5pXovers, lambda f: f & self._Xover5p)):
+            kept = [i for i in l if i not in changed]
+            kept.extend(i for i, f in changed.iteritems() if isMember(f))
+            kept.sort()
+            l[:] = kept
+        self._vhelix.oligoIndex().invalidate()
+
+    def _clearRun(self, startIndex, endIndex):
+        """Only VirtualHelix should call this method. Empties the bases in
+        [startIndex, endIndex], none of which may be linked to a base
+        outside of the range (as is the case for a run just connected by
+        _connectRun)."""
+        for arr in self._arrays():
+            arr.clearRange(startIndex, endIndex + 1)
+        for l in self._indexLists():
+            del l[bisect_left(l, startIndex):bisect_right(l, endIndex)]
+        self._vhelix.oligoIndex().invalidate()
+
+    ########################### Indices ###########################
+    def segmentBreaks(self):
+        """The sorted list of indices that are ends or crossovers. Should
+        be considered read only."""
+        return self._segmentBreaks
+
+    def threePrimeXoverIndices(self, startIndex=0, endIndex=None):
+        """Sorted indices in [startIndex, endIndex) whose 3' link is a
+        crossover"""
+        return self._indexSlice(self._3pXovers, startIndex, endIndex)
+
+    def fivePrimeXoverIndices(self, startIndex=0, endIndex=None):
+        """Sorted indices in [startIndex, endIndex) whose 5' link is a
+        crossover"""
+        return self._indexSlice(self._5pXovers, startIndex, endIndex)
+
+    def runEnd(self, index, ascending):
+        """The index of the last base of the run of sequentially linked
+        bases that starts at index and heads 3'-ward, which is up in index
+        if ascending. Uses the indices: the run can only stop at an end
+        or at a base whose 3' link is a crossover."""
+        if self._flags[index] & (self._Has3p | self._Xover3p) !=\
+                                                            self._Has3p:
+            return index  # A 3' end or crossover itself
+        ret = None
+        for l in (self._segmentBreaks, self._3pXovers):
+            if ascending:
+                k = bisect_right(l, index)
+                if k < len(l) and (ret == None or l[k] < ret):
+                    ret = l[k]
+            else:
+                k = bisect_left(l, index) - 1
+                if k >= 0 and (ret == None or l[k] > ret):
+                    ret = l[k]
+        assert(ret != None)  # Linked bases always lead to a break
+        return ret
+
+    def _runs(self):
+        """Only OligoIndex and the archive methods should call this. Every
+        run of sequentially linked bases (see runEnd) as (lo, hi,
+        fivePrimeIndex, threePrimeIndex), in ascending order. A run can only
+        start or stop at an indexed position, so this costs O(#runs) rather
+        than a walk over the strand."""
+        boundaries = sorted(set(self._segmentBreaks).union(self._3pXovers,\
+                                                           self._5pXovers))
+        ret = []
+        for k, index in enumerate(boundaries):
+            if ret and ret[-1][1] == index:
+                continue  # The top of the run below
+            up3 = self._3pHelix[index] == 0 and\
+                  self._3pIndex[index] == index + 1
+            up5 = self._5pHelix[index] == 0 and\
+                  self._5pIndex[index] == index + 1
+            if up3 or up5:
+                hi = boundaries[k + 1]
+                ret.append((index, hi, index, hi) if up3 else\
+                           (index, hi, hi, index))
+            else:
+                ret.append((index, index, index, index))
+        return ret
+
+    def archiveStrings(self, fiveTo3):
+        """The str() of every base of the strand (see Base.__str__), read
+        straight from the link arrays. Every base inside a run prints the
+        same way, so only the ends of each run are formatted (unless the
+        run goes against the strand's direction, when each base prints the
+        index of its neighbors)."""
+        ret = ['_,_'] * len(self._5pHelix)
+        for lo, hi, fivePrimeIndex, threePrimeIndex in self._runs():
+            if hi > lo + 1 and (fivePrimeIndex == lo) == fiveTo3:
+                ret[lo + 1:hi] = [self._archiveString(lo + 1, fiveTo3)] *\
+                                                                (hi - lo - 1)
+                indices = (lo, hi)
+            else:
+                indices = xrange(lo, hi + 1)
+            for index in indices:
+                ret[index] = self._archiveString(index, fiveTo3)
+        return ret
+
+    def _archiveString(self, index, fiveTo3):
+        nOffsetOf3 = 1 if fiveTo3 else -1
+        threeB, fiveB = '_', '_'
+        slot = self._3pHelix[index]
+        if slot >= 0:
+            n = self._3pIndex[index]
+            if slot == 0 and n == index + nOffsetOf3:
+                threeB = '>' if fiveTo3 else '<'
+            else:
+                threeB = "%i:%i" % (self._helices[slot].number(), n)
+        slot = self._5pHelix[index]
+        if slot >= 0:
+            n = self._5pIndex[index]
+            if slot == 0 and n == index - nOffsetOf3:
+                fiveB = '<' if fiveTo3 else '>'
+            else:
+                fiveB = "%i:%i" % (self._helices[slot].number(), n)
+        if fiveTo3:
+            return fiveB + ',' + threeB
+        return threeB + ',' + fiveB
+
+    def _indexSlice(self, sortedList, startIndex, endIndex):
+        lo = bisect_left(sortedList, startIndex) if startIndex > 0 else 0
+        if endIndex == None:
+            return sortedList[lo:]
+        return sortedList[lo:bisect_left(sortedList, endIndex)]
+
+    def _indexLists(self):
+        return (self._segmentBreaks, self._3pXovers, self._5pXovers)
+
+    def _updateSegmentBreak(self, index):
+        _setMembership(self._segmentBreaks, index,\
+                       self.isEnd(index) or self.isCrossover(index))
+
+    def _updateFlags(self, index):
+        """Recomputes and returns the state bits of the base at index from
+        its links, so that the predicates below can read them in one go"""
+        flags = 0
+        slot = self._5pHelix[index]
+        if slot >= 0:
+            flags |= self._Has5p
+            if slot > 0:
+                flags |= self._OtherHelix5p | self._Xover5p
+            elif abs(index - self._5pIndex[index]) != 1:
+                flags |= self._Xover5p
+        slot = self._3pHelix[index]
+        if slot >= 0:
+            flags |= self._Has3p
+            if slot > 0:
+                flags |= self._OtherHelix3p | self._Xover3p
+            elif abs(index - self._3pIndex[index]) != 1:
+                flags |= self._Xover3p
+        self._flags[index] = flags
+        return flags
+
+    def _rebuildIndices(self):
+        r = xrange(len(self._5pHelix))
+        self._flags = _SparseArray('B', 0, len(self._5pHelix))
+        for i in r:
+            if self._5pHelix[i] >= 0 or self._3pHelix[i] >= 0:
+                self._updateFlags(i)
+        self._segmentBreaks = [i for i in r\
+                               if self.isEnd(i) or self.isCrossover(i)]
+        self._3pXovers = [i for i in r if self.is3primeXover(i)]
+        self._5pXovers = [i for i in r if self.is5primeXover(i)]
+
+    ########################### Oligos ###########################
+    def color(self, index):
+        """The color of the oligo passing through the base at index"""
+        return self._vhelix.oligoIndex().colorOf(self[index])
+
+    def setColor(self, index, colorName):
+        """Colors the whole oligo passing through the base at index"""
+        self._vhelix.oligoIndex().setColor(self[index], colorName)
+
+    def _resetOligoIds(self):
+        """Only OligoIndex should call this method."""
+        self._oligo = _SparseArray('i', -1, len(self._5pHelix))
+
+    ########################### Predicates ###########################
+    # These read the bits _updateFlags stored when the links last changed
+    def isEmpty(self, index):
+        return not self._flags[index] & self._HasLinks
+
+    def linkFlags(self, indices):
+        """EmptyFlag | CrossoverFlag for the base at each of indices, in
+        a single pass over the state bits"""
+        flags = self._flags
+        hasLinks, otherHelix = self._HasLinks, self._OtherHelix
+        empty, xover = self.EmptyFlag, self.CrossoverFlag
+        ret = []
+        for i in indices:
+            f = flags[i]
+            if not f & hasLinks:
+                ret.append(empty)
+            elif f & otherHelix:
+                ret.append(xover)
+            else:
+                ret.append(0)
+        return ret
+
+    def isEmptyRange(self, startIndex, endIndex):
+        """True if every base in [startIndex, endIndex) is empty; skips
+        unallocated stretches without looking at their bases"""
+        return self._flags.isDefaultRange(startIndex, endIndex)
+
+    def emptyRanges(self, startIndex, endIndex):
+        """The maximal stretches [(lo, hi), ...] of empty bases within
+        [startIndex, endIndex] (inclusive, like the stretches returned)"""
+        if self.isEmptyRange(startIndex, endIndex + 1):
+            return [(startIndex, endIndex)]
+        flags, hasLinks = self._flags, self._HasLinks
+        ret, lo = [], None
+        for i in xrange(startIndex, endIndex + 1):
+            if flags[i] & hasLinks:
+                if lo != None:
+                    ret.append((lo, i - 1))
+                    lo = None
+            elif lo == None:
+                lo = i
+        if lo != None:
+            ret.append((lo, endIndex))
+        return ret
+
+    def is5primeEnd(self, index):
+        return self._flags[index] & self._HasLinks == self._Has3p
+
+    def is3primeEnd(self, index):
+        return self._flags[index] & self._HasLinks == self._Has5p
+
+    def isEnd(self, index):
+        hasLinks = self._flags[index] & self._HasLinks
+        return hasLinks == self._Has5p or hasLinks == self._Has3p
+
+    def isStrand(self, index):
+        return self._flags[index] & self._HasLinks == self._HasLinks
+
+    def isCrossover(self, index):
+        """True if either neighbor of the base lives on another helix."""
+        return self._flags[index] & self._OtherHelix != 0
+
+    def is3primeXover(self, index):
+        """True if the 3' neighbor is on another helix or is not
+        adjacent to the base."""
+        return self._flags[index] & self._Xover3p != 0
+
+    def is5primeXover(self, index):
+        """True if the 5' neighbor is on another helix or is not
+        adjacent to the base."""
+        return self._flags[index] & self._Xover5p != 0
+
+
+class LinkageRuns(object):
+    """
+    The linkage that a strand command overwrote: the tuples returned by
+    Base._set3Prime or Base._set5Prime for a run of consecutive bases of
+    one strand, in the order they were appended. Nearly every base of a
+    drag was either empty, (None, None), or already connected to its
+    successor, (strand[i+1], None), so those are stored as runs of
+    (kind, startIndex, count) and cost the same however long the drag was.
+    Anything else (crossovers, ends) is kept verbatim.
+    """
+    Empty, Sequential, Explicit = 0, 1, 2
+    __slots__ = ('_vhelix', '_strandType', '_runs', '_explicit')
+
+    def __init__(self, vhelix, strandType):
+        self._vhelix = vhelix
+        self._strandType = strandType
+        self._runs = array('i')  # flat (kind, startIndex, count) triples
+        self._explicit = None  # index -> linkage for Explicit bases
+
+    def append(self, index, linkage):
+        fromOld, toOld = linkage
+        if toOld == None and fromOld == None:
+            kind = self.Empty
+        elif toOld == None and fromOld._n == index + 1 and\
+             fromOld._vhelix is self._vhelix:
+            kind = self.Sequential
+        else:
+            kind = self.Explicit
+            if self._explicit == None:
+                self._explicit = {}
+            self._explicit[index] = linkage
+        runs = self._runs
+        if runs and runs[-3] == kind and runs[-2] + runs[-1] == index:
+            runs[-1] += 1
+        else:
+            runs.extend((kind, index, 1))
+
+    def reversedItems(self):
+        """Yields (index, linkage) from the last appended to the first,
+        which is the order they have to be undone in"""
+        runs = self._runs
+        for r in xrange(len(runs) - 3, -1, -3):
+            kind, start, count = runs[r], runs[r + 1], runs[r + 2]
+            for index in xrange(start + count - 1, start - 1, -1):
+                if kind == self.Empty:
+                    yield index, (None, None)
+                elif kind == self.Sequential:
+                    yield index, (Base(self._vhelix, self._strandType,\
+                                       index + 1), None)
+                else:
+                    yield index, self._explicit[index]
@@ -0,0 +1,160 @@
+# The MIT License
+#
+# Copyright (c) 2011 Wyss Institute at Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# http://www.opensource.org/licenses/mit-license.php
+
+"""
+undohistory.py
+"""
+from PyQt4.QtGui import QUndoStack
+from weakref import ref
+
+
+class UndoHistory(QUndoStack):
+    """
+    The document undo stack, with a bounded history. Only the last
+    undoLimit commands are kept (QUndoStack drops the oldest ones); every
+    checkpointInterval commands the receiver also takes a PartCheckpoint
+    of each part of the document. Checkpoints are far smaller than the
+    commands they stand in for, and up to maxCheckpointBytes of them are
+    kept so that the user can still return to a state older than the
+    command history through restoreCheckpoint (which is itself undoable).
+    An undoLimit of 0 keeps every command, as a plain QUndoStack does.
+
+    The interval grows with the design: once minRetainedCheckpoints of
+    the last checkpoint no longer fit in maxCheckpointBytes, checkpoints
+    are taken proportionally less often, so that the ones kept still
+    reach as far back and taking them costs about as much per command.
+    The states that restoreCheckpoint's commands hold for undo count
+    against the same budget for as long as the commands are on the stack.
+    """
+    minRetainedCheckpoints = 16
+
+    def __init__(self, undoLimit=1000, checkpointInterval=100,\
+                 maxCheckpointBytes=64 * 1024 * 1024):
+        super(UndoHistory, self).__init__()
+        # QUndoStack only accepts a limit while it is empty
+        self.setUndoLimit(undoLimit)
+        self._document = None
+        self._checkpointInterval = checkpointInterval
+        self._currentInterval = checkpointInterval  # Scaled to the design
+        self._maxCheckpointBytes = maxCheckpointBytes
+        self._checkpoints = []  # [(text, [PartCheckpoint, ...], bytes)]
+        self._checkpointBytes = 0
+        # [(ref to the PartCheckpoint a RestoreCheckpointCommand holds, bytes)]
+        self._restoredStates = []
+        self._pushesSinceCheckpoint = 0
+        self._macroDepth = 0
+
+    def document(self):
+        return self._document
+
+    def setDocument(self, doc):
+        self._document = doc
+        self._checkpoints, self._checkpointBytes = [], 0
+        self._currentInterval = self._checkpointInterval
+
+    def push(self, cmd):
+        super(UndoHistory, self).push(cmd)
+        if self._macroDepth == 0:
+            self._notePush()
+
+    def beginMacro(self, text):
+        self._macroDepth += 1
+        super(UndoHistory, self).beginMacro(text)
+
+    def endMacro(self):
+        super(UndoHistory, self).endMacro()
+        self._macroDepth -= 1
+        if self._macroDepth == 0:
+            self._notePush()
+
+    def _notePush(self):
+        self._pushesSinceCheckpoint += 1
+        if self._checkpointInterval > 0 and\
+           self._pushesSinceCheckpoint >= self._currentInterval:
+            self.addCheckpoint()
+
+    ############################# Checkpoints #############################
+    def checkpoints(self):
+        """The (text, bytes) of every retained checkpoint, oldest first;
+        pass a position in this list to restoreCheckpoint"""
+        return [(text, nbytes) for text, cps, nbytes in self._checkpoints]
+
+    def checkpointInterval(self):
+        """The number of commands between checkpoints at the current size
+        of the design"""
+        return self._currentInterval
+
+    def checkpointBytes(self):
+        """The bytes counted against maxCheckpointBytes: the retained
+        checkpoints and the states held by restoreCheckpoint's commands"""
+        return self._checkpointBytes + self._restoredStateBytes()
+
+    def addCheckpoint(self):
+        """Snapshots every part of the document, labeled with the text of
+        the command on top of the stack, and drops the oldest checkpoints
+        once they use more than maxCheckpointBytes. A checkpoint that
+        doesn't fit in the budget by itself is not kept at all."""
+        self._pushesSinceCheckpoint = 0
+        if self._document == None:
+            return
+        cps = [part.checkpoint() for part in self._document.parts()]
+        nbytes = sum(cp.byteSize() for cp in cps)
+        interval, budget = self._checkpointInterval, self._maxCheckpointBytes
+        self._currentInterval = max(interval, -(-interval * nbytes *\
+                                    self.minRetainedCheckpoints // budget))
+        if nbytes > budget:
+            return
+        top = self.command(self.index() - 1)
+        text = top.text() if top != None else ""
+        self._checkpoints.append((text, cps, nbytes))
+        self._checkpointBytes += nbytes
+        self._dropCheckpointsOverBudget()
+
+    def _restoredStateBytes(self):
+        """Forgets the states of restore commands that the stack has since
+        deleted and returns the bytes held by the rest"""
+        self._restoredStates = [(state, nbytes) for state, nbytes in\
+                                self._restoredStates if state() != None]
+        return sum(nbytes for state, nbytes in self._restoredStates)
+
+    def _dropCheckpointsOverBudget(self):
+        budget = self._maxCheckpointBytes - self._restoredStateBytes()
+        while self._checkpoints and self._checkpointBytes > budget:
+            self._checkpointBytes -= self._checkpoints.pop(0)[2]
+
+    def canRestoreCheckpoint(self, i):
+        return all(cp.canRestore() for cp in self._checkpoints[i][1])
+
+    def restoreCheckpoint(self, i):
+        """Returns every part to the state recorded by the i-th checkpoint
+        as a single undoable step. The checkpoint must still be restorable
+        (helices have not been added or removed since it was taken)."""
+        text, cps, nbytes = self._checkpoints[i]
+        assert(self.canRestoreCheckpoint(i))
+        self.beginMacro("Restoring checkpoint: %s" % text)
+        for cp in cps:
+            oldState = cp.part().restoreCheckpoint(cp).oldState()
+            self._restoredStates.append((ref(oldState), oldState.byteSize()))
+        self.endMacro()
+        self._dropCheckpointsOverBudget()
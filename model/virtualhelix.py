@@ -28,12 +28,14 @@ Created by Jonathan deWerd on 2011-01-26.
 """
 import sys
 from exceptions import AttributeError, IndexError
-from itertools import product
 from .enum import LatticeType, Parity, StrandType, BreakType
 from .enum import Crossovers, EndType
 from PyQt4.QtCore import pyqtSignal, QObject
 from PyQt4.QtGui import QUndoCommand, QUndoStack, QColor
 from .base import Base
+from .strandarray import StrandArray, LinkageRuns
+from .loopindex import LoopIndex
+from .oligoindex import OligoIndex
 from util import *
 from cadnano import app
 import ui.styles as styles
@@ -43,6 +45,9 @@ import re
 class VirtualHelix(QObject):
     """Stores staple and scaffold routing information."""
     basesModified = pyqtSignal()
+    # Emitted right after basesModified with the (inclusive) index range
+    # that changed, for views that only need to refresh part of the helix
+    basesModifiedInRange = pyqtSignal(int, int)
     dimensionsModified = pyqtSignal()
 
     def __init__(self, numBases=21, idnum=0, incompleteArchivedDict=None):
@@ -65,8 +70,8 @@ class VirtualHelix(QObject):
         # self should no longer modify _row, _col, or _number)
         self._part = None
         # The base arrays are owned entirely by virtualhelix
-        self._stapleBases = []
-        self._scaffoldBases = []
+        self._stapleBases = StrandArray(self, StrandType.Staple)
+        self._scaffoldBases = StrandArray(self, StrandType.Scaffold)
         
         """
         This is for loops and skips.
@@ -75,9 +80,10 @@ class VirtualHelix(QObject):
         of the form { index: count }
         + count indicates loop 
         - count indicates skip
+        (see LoopIndex, which also answers nucleotide offset queries)
         """
-        self._stapleLoops = {}
-        self._scaffoldLoops = {}
+        self._stapleLoops = LoopIndex()
+        self._scaffoldLoops = LoopIndex()
         
         # setSandboxed(True) gives self a private undo stack
         # in order to insulate undo/redo on the receiver
@@ -89,11 +95,16 @@ class VirtualHelix(QObject):
         # goes back to using the part / document undo stack.
         self._privateUndoStack = None
         self._sandboxed = False
+        # Oligo bookkeeping belongs to the part; a detached helix
+        # gets a private index (see oligoIndex)
+        self._privateOligoIndex = None
         # numBases is a simulated property that corresponds to the
         # length of _stapleBases and _scaffoldBases
         if incompleteArchivedDict:
-            numBases = len(re.split('\s+',\
-                                    incompleteArchivedDict['staple'])) - 1
+            numBases = incompleteArchivedDict.get('numBases', None)
+            if numBases == None:
+                numBases = len(re.split('\s+',\
+                                        incompleteArchivedDict['staple'])) - 1
         self.setNumBases(numBases, notUndoable=True)
         # Command line convenience for -i mode
         if app().v != None:
@@ -114,12 +125,15 @@ class VirtualHelix(QObject):
 
     def _setPart(self, newPart, row, col, num):
         """Should only be called by dnapart. Use dnapart's
-        setVirtualHelixAt to add a virtualhelix to a dnapart."""
-        if self._part:
-            self._part.setVirtualHelixAt(row, col, None)
+        setVirtualHelixAt to add a virtualhelix to a dnapart (which takes
+        it out of the slot it held before, if any)."""
         self._row = row
         self._col = col
         self._number = num
+        if self._privateOligoIndex != None:
+            # Our oligo ids were assigned by the private index
+            self._privateOligoIndex = None
+            newPart.oligoIndex().invalidate()
         self._part = newPart
         self.setNumBases(newPart.numBases(), notUndoable=True)
 
@@ -150,6 +164,10 @@ class VirtualHelix(QObject):
                 c0.redo()
                 c1.redo()
                 c2.redo()
+            elif self.part():
+                self.undoStack().push(self.part().MacroCommand(self.part(),\
+                                      "Changing the number of bases",\
+                                      (c0, c1, c2)))
             else:
                 u = self.undoStack()
                 u.beginMacro("Changing the number of bases")
@@ -169,24 +187,15 @@ class VirtualHelix(QObject):
             self._number = newNumber
 
     def selected(self):
-        return self in self.part().selection()
+        return self.part().isSelected(self)
 
     # dnapart owns its selection, so look there for related
     # event emission
     def setSelected(self, willBeSelected):
-        currentSelection = self.part().selection()
-        selected = self in currentSelection
-        needsSelecting = willBeSelected and not selected
-        needsDeselectig = not willBeSelected and selected
-        if needsSelecting:
-            # We're modifying part()'s selection
-            # object beneath it. I won't tell it
-            # if you don't. Safety would demand
-            # selection() returns a copy.
-            currentSelection.append(self)
-        elif needsDeselectig:
-            currentSelection.remove(self)
-        self.part().setSelection(currentSelection)
+        if willBeSelected:
+            self.part().addToSelection((self,))
+        else:
+            self.part().removeFromSelection((self,))
 
     def _setNumber(self, newNumber):
         """_part is responsible for assigning ids, so only it gets to
@@ -249,11 +258,10 @@ class VirtualHelix(QObject):
     ########################### Access to Bases ###################
     def hasBaseAt(self, strandType, index):
         """Returns true if a base is present at index on strand strandtype."""
-        base = self._baseAt(strandType, index)
-        if not base:
+        strandType, index = self.validatedBase(strandType, index)
+        if strandType == None:
             return False
-        else:
-            return not base.isEmpty()
+        return not self._strand(strandType).isEmpty(index)
 
     def validatedBase(self, strandType, index, raiseOnErr=False):
         """Makes sure the basespec (strandType,index) is valid
@@ -282,60 +290,47 @@ class VirtualHelix(QObject):
 
     def hasCrossoverAt(self, strandType, index):
         """docstring for hasScafCrossoverAt"""
-        base = self._baseAt(strandType, index)
-        if not base:
+        strandType, index = self.validatedBase(strandType, index)
+        if strandType == None:
             return False
-        else:
-            return base.isCrossover()
+        return self._strand(strandType).isCrossover(index)
 
     def hasStrandAt(self, strandType, index):
         """A strand base is a base that is connected to
         other bases on both sides (possibly over a staple)"""
-        base = self._baseAt(strandType, index)
-        if not base:
+        strandType, index = self.validatedBase(strandType, index)
+        if strandType == None:
             return False
-        else:
-            return base.isStrand()
+        return self._strand(strandType).isStrand(index)
 
     def hasEndAt(self, strandType, index):
-        base = self._baseAt(strandType, index)
-        if not base:
+        strandType, index = self.validatedBase(strandType, index)
+        if strandType == None:
             return False
-        else:
-            return base.isEnd()
+        return self._strand(strandType).isEnd(index)
     
     def getSegments(self, strandType):
         """Returns a list of segments of connected bases in the form
         [(startIdx, startIsXO, endIdx, endIsXO), ...]"""
-        ret = []
         strand = self._strand(strandType)
-        i, s = 0, None
-        # s is the start index of the segment
-        for i in range(len(strand)):
-            b = strand[i]
-            isXO = b.isCrossover()
-            isEnd = b.isEnd()
-            if not isXO and not isEnd:
-                continue
-            if s == None:
-                s = (i, isXO)
-            else:
-                ret.append(s + (i, isXO))
-                s = None
+        # Consecutive pairs of segment breaks delimit a segment
+        breaks = strand.segmentBreaks()
+        ret = []
+        for k in range(0, len(breaks) - 1, 2):
+            s, e = breaks[k], breaks[k + 1]
+            ret.append((s, strand.isCrossover(s), e, strand.isCrossover(e)))
         return ret
 
-    def get3PrimeXovers(self, strandType):
+    def get3PrimeXovers(self, strandType, startIndex=0, endIndex=None):
         """
         Returns a tuple of tuples of the FROM base (3p end) the TO base
-        (5p end)
+        (5p end), optionally only for FROM bases in [startIndex, endIndex)
         """
         ret = []
         strand = self._strand(strandType)
-        i, s = 0, None
-        for base in strand:
-            if base.is3primeXover():
-                ret.append(((self, base._n),\
-                    (base._3pBase.vhelix(), base._3pBase._n)))
+        for i in strand.threePrimeXoverIndices(startIndex, endIndex):
+            toBase = strand.get3pBase(i)
+            ret.append(((self, i), (toBase.vhelix(), toBase._n)))
         # end for
         return ret
     # end def
@@ -360,8 +355,7 @@ class VirtualHelix(QObject):
             # return QColor(44, 51, 141)
         # hue = 47 * idx + 31 * self.number()
         # return QColor.fromHsl(hue % 256, 255, 128)
-        c = QColor(self._stapleBases[idx].getColor())
-        # print "colorOfBase", idx, c.name(), self._stapleBases[idx].getColor()
+        c = QColor(self._stapleBases.color(idx))
         return c
 
     def sandboxed(self):
@@ -383,6 +377,13 @@ class VirtualHelix(QObject):
                 self._sandboxed = False
                 self._privateUndoStack = None
 
+    def oligoIndex(self):
+        if self._part != None:
+            return self._part.oligoIndex()
+        if self._privateOligoIndex == None:
+            self._privateOligoIndex = OligoIndex(lambda: (self,))
+        return self._privateOligoIndex
+
     def undoStack(self):
         if self._privateUndoStack != None:
             return self._privateUndoStack
@@ -405,8 +406,18 @@ class VirtualHelix(QObject):
         _doSomething() -> Private API
     or Outside World -> doSomething() -> DoSomethingUndoCommand -> Private API
     """
-    def emitModificationSignal(self):
+    def emitModificationSignal(self, startIndex=0, endIndex=None):
+        """Announces that the bases in [startIndex, endIndex] changed. While
+        the part is in a batchEdit the announcement is deferred and merged
+        with the others for this helix into a single emission."""
+        if endIndex == None:
+            endIndex = self.numBases() - 1
+        part = self._part
+        if part != None and part.isBatchEditing():
+            part._noteModifiedBases(self, startIndex, endIndex)
+            return
         self.basesModified.emit()
+        self.basesModifiedInRange.emit(startIndex, endIndex)
 
     def connectStrand(self, strandType, startIndex, endIndex):
         """
@@ -465,15 +476,21 @@ class VirtualHelix(QObject):
         return index in self._loop(strandType)
     # end def
         
+    def nucleotideOffset(self, strandType, index):
+        """Lattice index -> position along the helix in nucleotides,
+        counting loops and skips at lower indices"""
+        return self._loop(strandType).nucleotideOffset(index)
+
+    def nucleotideCount(self, strandType, startIndex, endIndex):
+        """Nucleotides in the (inclusive) range of lattice indices,
+        counting the loops and skips in it"""
+        return self._loop(strandType).nucleotideCount(startIndex, endIndex)
+
     def installLoop(self, strandType, index, loopsize):
         c = self.LoopCommand(self, strandType, index, loopsize)
         self.undoStack().push(c)
     # end def
     
-    def emitModificationSignal(self):
-        self.basesModified.emit()
-        #self.part().virtualHelixAtCoordsChanged.emit(*self.coord())
-
     ################ Private Base Modification API ###########################
     class LoopCommand(QUndoCommand):
         def __init__(self, virtualHelix, strandType, index, loopsize):
@@ -498,7 +515,7 @@ class VirtualHelix(QObject):
                         del loop[self._index]
                     # end if
                 # end else
-                self._vh.emitModificationSignal()
+                self._vh.emitModificationSignal(self._index, self._index)
             
         def undo(self):
             if self._vh.hasStrandAt(self._strandType, self._index):
@@ -512,27 +529,11 @@ class VirtualHelix(QObject):
                         del loop[self._index]
                     # end if
                 # end else
-                self._vh.emitModificationSignal()
+                self._vh.emitModificationSignal(self._index, self._index)
 
     def applyColorAt(self, colorName, strandType, index):
-        """docstring for applyColorAt"""
-        strand = self._strand(strandType)
-        startBase = strand[index]
-        # traverse to 5' end
-        base = startBase
-        while not base.is5primeEnd():
-            base.setColor(colorName)
-            base = base.get5pBase()  # advance to next
-            if base == startBase:  # check for circular path
-                return
-        base.setColor(colorName)  # last 5' base
-        # traverse to 3' end
-        if not startBase.is3primeEnd():
-            base = startBase.get3pBase()  # already processed startBase
-            while not base.is3primeEnd():
-                base.setColor(colorName)
-                base = base.get3pBase()  # advance to next
-            base.setColor(colorName)  # last 3' base
+        """Colors the oligo passing through the base at index"""
+        self._strand(strandType).setColor(index, colorName)
         self.emitModificationSignal()
 
     class ConnectStrandCommand(QUndoCommand):
@@ -548,34 +549,32 @@ class VirtualHelix(QObject):
             # Sets {s.n, (s+1).np, ..., (e-2).np, (e-1).np, e.p}
             # st s, s+1, ..., e-1, e are connected
             strand = self._vh._strand(self._strandType)
-            ol = self._oldLinkage = []
+            ol = self._oldLinkage = LinkageRuns(self._vh, self._strandType)
             if self._vh.directionOfStrandIs5to3(self._strandType):
                 for i in range(self._startIndex, self._endIndex):
-                    ol.append(strand[i]._set3Prime(strand[i + 1]))
+                    ol.append(i, strand[i]._set3Prime(strand[i + 1]))
             # end if
             else:
                 for i in range(self._startIndex, self._endIndex):
-                    ol.append(strand[i]._set5Prime(strand[i + 1]))
+                    ol.append(i, strand[i]._set5Prime(strand[i + 1]))
             # end else
-            self._vh.emitModificationSignal()
+            self._vh.emitModificationSignal(self._startIndex, self._endIndex)
 
         def undo(self):
             strand = self._vh._strand(self._strandType)
             ol = self._oldLinkage
             assert(ol != None)  # Must redo/apply before undo
             if self._vh.directionOfStrandIs5to3(self._strandType):
-                for i in range(self._endIndex - 1, self._startIndex - 1, -1):
-                    strand[i]._unset3Prime(strand[i + 1],\
-                                           *ol[i - self._startIndex])
+                for i, linkage in ol.reversedItems():
+                    strand[i]._unset3Prime(strand[i + 1], *linkage)
                 # end for
             # end if
             else:
-                for i in range(self._endIndex - 1, self._startIndex - 1, -1):
-                    strand[i]._unset5Prime(strand[i + 1],\
-                                           *ol[i - self._startIndex])
+                for i, linkage in ol.reversedItems():
+                    strand[i]._unset5Prime(strand[i + 1], *linkage)
                 # end for
             # end else
-            self._vh.emitModificationSignal()
+            self._vh.emitModificationSignal(self._startIndex, self._endIndex)
 
     class ClearStrandCommand(QUndoCommand):
         def __init__(self, virtualHelix, strandType, startIndex, endIndex):
@@ -591,19 +590,20 @@ class VirtualHelix(QObject):
             # Be warned, start index and end index become endpoints
             # if this is called in the middle of a connected strand
             strand = self._vh._strand(self._strandType)
-            ol = self._oldLinkage = []
+            ol = self._oldLinkage = LinkageRuns(self._vh, self._strandType)
 
             if self._vh.directionOfStrandIs5to3(self._strandType):
                 for i in range(self._startIndex - 1, self._endIndex):
-                    ol.append(strand[i]._set3Prime(None))
+                    ol.append(i, strand[i]._set3Prime(None))
                 # end for
             # end if
             else:
                 for i in range(self._startIndex - 1, self._endIndex):
-                    ol.append(strand[i]._set5Prime(None))
+                    ol.append(i, strand[i]._set5Prime(None))
                 # end for
             # end else
-            self._vh.emitModificationSignal()
+            self._vh.emitModificationSignal(self._startIndex - 1,\
+                                            self._endIndex)
         # end def
 
         def undo(self):
@@ -611,18 +611,40 @@ class VirtualHelix(QObject):
             ol = self._oldLinkage
             assert(ol != None)  # Must redo/apply before undo
             if self._vh.directionOfStrandIs5to3(self._strandType):
-                for i in range(self._endIndex - 1, self._startIndex - 2, -1):
-                    strand[i]._unset3Prime(None, *ol[i - self._startIndex + 1])
+                for i, linkage in ol.reversedItems():
+                    strand[i]._unset3Prime(None, *linkage)
                 # end for
             # end if
             else:
-                for i in range(self._endIndex - 1, self._startIndex - 2, -1):
-                    strand[i]._unset5Prime(None, *ol[i - self._startIndex + 1])
+                for i, linkage in ol.reversedItems():
+                    strand[i]._unset5Prime(None, *linkage)
                 # end for
             # end else
-            self._vh.emitModificationSignal()
+            self._vh.emitModificationSignal(self._startIndex - 1,\
+                                            self._endIndex)
         # end def
 
+    class FillStrandCommand(QUndoCommand):
+        """ConnectStrandCommand for a range of bases that are all empty,
+        which the StrandArray links as a whole instead of base by base"""
+        def __init__(self, virtualHelix, strandType, startIndex, endIndex):
+            super(VirtualHelix.FillStrandCommand, self).__init__()
+            self._vh = virtualHelix
+            self._strandType = strandType
+            self._startIndex = startIndex
+            self._endIndex = endIndex
+
+        def redo(self):
+            vh, st = self._vh, self._strandType
+            vh._strand(st)._connectRun(self._startIndex, self._endIndex,\
+                                       vh.directionOfStrandIs5to3(st))
+            vh.emitModificationSignal(self._startIndex, self._endIndex)
+
+        def undo(self):
+            self._vh._strand(self._strandType)._clearRun(self._startIndex,\
+                                                         self._endIndex)
+            self._vh.emitModificationSignal(self._startIndex, self._endIndex)
+
     class Connect3To5Command(QUndoCommand):
         def __init__(self, strandType, fromHelix, fromIndex, toHelix, toIndex):
             super(VirtualHelix.Connect3To5Command, self).__init__()
@@ -636,16 +658,84 @@ class VirtualHelix(QObject):
             fromB = self._fromHelix._strand(self._strandType)[self._fromIndex]
             toB = self._toHelix._strand(self._strandType)[self._toIndex]
             self._undoDat = fromB._set3Prime(toB)
-            self._fromHelix.emitModificationSignal()
-            self._toHelix.emitModificationSignal()
+            self.emitModificationSignals()
 
         def undo(self):
             fromB = self._fromHelix._strand(self._strandType)[self._fromIndex]
             toB = self._toHelix._strand(self._strandType)[self._toIndex]
             assert(self._undoDat)  # Must redo/apply before undo
             fromB._unset3Prime(toB, *self._undoDat)
-            self._fromHelix.emitModificationSignal()
-            self._toHelix.emitModificationSignal()
+            self.emitModificationSignals()
+
+        def emitModificationSignals(self):
+            """Covers the old 3' partner of the from base and the old 5'
+            partner of the to base too, which redo lets go of and undo
+            reattaches, on whichever helices they are"""
+            ranges = []  # [[vhelix, lo, hi], ...] in order of appearance
+            touched = [(self._fromHelix, self._fromIndex),\
+                       (self._toHelix, self._toIndex)]
+            touched.extend((b._vhelix, b._n) for b in self._undoDat\
+                                                        if b != None)
+            for vh, index in touched:
+                for r in ranges:
+                    if r[0] == vh:
+                        r[1], r[2] = min(r[1], index), max(r[2], index)
+                        break
+                else:
+                    ranges.append([vh, index, index])
+            for vh, lo, hi in ranges:
+                vh.emitModificationSignal(lo, hi)
+
+    class InstallXoversCommand(QUndoCommand):
+        """Has the effect of a Connect3To5Command for each (fromHelix,
+        fromIndex, toHelix, toIndex) of xovers, in order, but rewrites the
+        links of each strand involved in a single pass (see
+        StrandArray._setLinksAt)"""
+        def __init__(self, strandType, xovers):
+            super(VirtualHelix.InstallXoversCommand, self).__init__()
+            self._strandType = strandType
+            self._xovers = list(xovers)
+            self._oldLinks = None  # strand -> [(index, link5, link3), ...]
+
+        def redo(self):
+            st = self._strandType
+            links, old = {}, {}  # strand -> {index: [link5, link3]}
+
+            def linksAt(vh, index):
+                strand = vh._strand(st)
+                l = links.setdefault(strand, {}).get(index, None)
+                if l == None:
+                    l = links[strand][index] = strand._linksAt(index)
+                    old.setdefault(strand, []).append((index,) + tuple(l))
+                return l
+
+            for fromHelix, fromIndex, toHelix, toIndex in self._xovers:
+                fromLinks = linksAt(fromHelix, fromIndex)
+                toLinks = linksAt(toHelix, toIndex)
+                # As in Base._set3Prime, the old partners are let go
+                if fromLinks[1] != None:
+                    linksAt(*fromLinks[1])[0] = None
+                if toLinks[0] != None:
+                    linksAt(*toLinks[0])[1] = None
+                fromLinks[1] = (toHelix, toIndex)
+                toLinks[0] = (fromHelix, fromIndex)
+            for strand, strandLinks in links.iteritems():
+                strand._setLinksAt((i, l5, l3) for i, (l5, l3) in\
+                                                    strandLinks.iteritems())
+            self._oldLinks = old
+            self.emitModificationSignals()
+
+        def undo(self):
+            assert(self._oldLinks != None)  # Must redo/apply before undo
+            for strand, oldLinks in self._oldLinks.iteritems():
+                strand._setLinksAt(oldLinks)
+            self.emitModificationSignals()
+
+        def emitModificationSignals(self):
+            for strand, oldLinks in self._oldLinks.iteritems():
+                indices = [l[0] for l in oldLinks]
+                strand._vhelix.emitModificationSignal(min(indices),\
+                                                      max(indices))
 
     class Break3To5Command(QUndoCommand):
         def __init__(self, strandType, vhelix, index):
@@ -657,19 +747,23 @@ class VirtualHelix(QObject):
             base = self._base
             self._old3pBase = base._3pBase
             base._set3Prime(None)
-            base._vhelix.emitModificationSignal()
-            otherVH = self._old3pBase._vhelix
-            if otherVH != base._vhelix:
-                otherVH.emitModificationSignal()
+            self.emitModificationSignals()
 
         def undo(self):
             assert(self._old3pBase)
             base = self._base
             base._set3Prime(self._old3pBase)
-            base._vhelix.emitModificationSignal()
-            otherVH = self._old3pBase._vhelix
-            if otherVH != base._vhelix:
-                otherVH.emitModificationSignal()
+            self.emitModificationSignals()
+
+        def emitModificationSignals(self):
+            base, otherBase = self._base, self._old3pBase
+            if otherBase._vhelix != base._vhelix:
+                base._vhelix.emitModificationSignal(base._n, base._n)
+                otherBase._vhelix.emitModificationSignal(otherBase._n,\
+                                                         otherBase._n)
+            else:
+                lo, hi = sorted((base._n, otherBase._n))
+                base._vhelix.emitModificationSignal(lo, hi)
 
     class SetNumBasesCommand(QUndoCommand):
         def __init__(self, vhelix, newNumBases):
@@ -687,13 +781,17 @@ class VirtualHelix(QObject):
             if vh.part():
                 # If we are attached to a dnapart we must obey its dimensions
                 assert(vh.part().numBases() == newNumBases)
-            if newNumBases > oldNB:
-                for n in range(oldNB, newNumBases):
-                    vh._stapleBases.append(Base(vh, StrandType.Staple, n))
-                    vh._scaffoldBases.append(Base(vh, StrandType.Scaffold, n))
-            else:
-                del vh._stapleBases[oldNB:-1]
-                del vh._scaffoldBases[oldNB:-1]
+            loops = (vh._scaffoldLoops, vh._stapleLoops)
+            if not actuallyUndo:
+                # Loops and skips past the new end go with their bases
+                self.droppedLoops = [l.removeFrom(newNumBases) for l in loops]
+            # Shrinking only drops bases; the caller clears them first
+            vh._stapleBases.resize(newNumBases)
+            vh._scaffoldBases.resize(newNumBases)
+            if actuallyUndo:
+                for l, dropped in zip(loops, self.droppedLoops):
+                    for index, count in dropped:
+                        l[index] = count
             vh.dimensionsModified.emit()
 
         def undo(self):
@@ -703,22 +801,16 @@ class VirtualHelix(QObject):
     def potentialCrossoverList(self, facingRight, strandType):
         """Returns a list of [neighborVirtualHelix, index] potential
         crossovers"""
-        ret = []  # LUT = Look Up Table
+        ret = []
         part = self._part
-        luts = (part.scafL, part.scafR, part.stapL, part.stapR)
-
-        # these are the list of crossover points simplified
-        lut = luts[int(facingRight) +\
-                   2 * int(strandType == StrandType.Staple)]
-
         neighbors = self.neighbors()
         for p in range(len(neighbors)):
             neighbor = neighbors[p]
             if not neighbor:
                 continue
-            for i, j in product(range(0, self.numBases(), part.step), lut[p]):
-                index = i + j
-                ret.append([neighbor, index])
+            # Precomputed by the part (LUT = Look Up Table)
+            lut = part.potentialCrossoverIndices(facingRight, strandType, p)
+            ret.extend([neighbor, index] for index in lut)
         return ret
 
     def crossoverAt(self, strandType, fromIndex, neighbor, toIndex):
@@ -751,6 +843,39 @@ class VirtualHelix(QObject):
                 return  not self.stapleBase(fromIndex).isEmpty() and \
                     not neighbor.stapleBase(toIndex).isEmpty()
 
+    def crossoverStatesAt(self, strandType, candidates):
+        """
+        candidates is a sequence of (fromIndex, neighbor, toIndex). Returns
+        two lists of bools with an entry per candidate: whether a new
+        crossover could be formed there (see possibleNewCrossoverAt) and
+        whether the from base already is a crossover (see hasCrossoverAt).
+        The bases are looked up in bulk, one pass per helix involved,
+        which is how the path view refreshes its pre-crossover handles.
+        """
+        fromStrand = self._strand(strandType)
+        numBases = len(fromStrand)
+        fromIndices, toIndices = [], {}  # neighbor -> [toIndex, ...]
+        for fromIndex, neighbor, toIndex in candidates:
+            if 0 <= fromIndex < numBases:
+                fromIndices.append(fromIndex)
+            if 0 <= toIndex < neighbor.numBases():
+                toIndices.setdefault(neighbor, []).append(toIndex)
+        fromFlags = dict(zip(fromIndices, fromStrand.linkFlags(fromIndices)))
+        toFlags = {}  # (neighbor, toIndex) -> flags
+        for neighbor, indices in toIndices.iteritems():
+            flags = neighbor._strand(strandType).linkFlags(indices)
+            toFlags.update(zip(((neighbor, i) for i in indices), flags))
+        # A base we know nothing about can't take part in a crossover
+        unusable = StrandArray.EmptyFlag | StrandArray.CrossoverFlag
+        couldForm, exists = [], []
+        for fromIndex, neighbor, toIndex in candidates:
+            f = fromFlags.get(fromIndex, unusable)
+            t = toFlags.get((neighbor, toIndex), unusable)
+            couldForm.append(not (f | t) & unusable)
+            exists.append(fromIndex in fromFlags and\
+                          f & StrandArray.CrossoverFlag != 0)
+        return couldForm, exists
+
     def getLeftScafPreCrossoverIndexList(self):
         return self.potentialCrossoverList(False, StrandType.Scaffold)
 
@@ -775,10 +900,10 @@ class VirtualHelix(QObject):
     #################### Archiving / Unarchiving #############################
     # A helper method; not part of the archive protocol
     def encodeStrand(self, strandType):
-        strand = self._strand(strandType)
-        numBases = self.numBases()
-        strdir = "5->3" if self.directionOfStrandIs5to3(strandType) else "3->5"
-        return "(%s) " % (strdir) + " ".join(str(b) for b in strand)
+        fiveTo3 = self.directionOfStrandIs5to3(strandType)
+        strdir = "5->3" if fiveTo3 else "3->5"
+        return "(%s) " % (strdir) +\
+               " ".join(self._strand(strandType).archiveStrings(fiveTo3))
 
     def fillSimpleRep(self, sr):
         """Fills sr with a representation of self in terms
@@ -797,10 +922,26 @@ class VirtualHelix(QObject):
     finishInitPriority = 1.0  # AFTER DNAParts finish init
 
     def finishInitWithArchivedDict(self, completeArchivedDict):
+        if not isinstance(completeArchivedDict['staple'], basestring):
+            # A binary archive hands over the link arrays themselves
+            # (see binaryarchive.ArchivedStrand)
+            completeArchivedDict['scafld'].installInto(self._scaffoldBases)
+            completeArchivedDict['staple'].installInto(self._stapleBases)
+            return
         scaf = re.split('\s+', completeArchivedDict['scafld'])[1:]
         stap = re.split('\s+', completeArchivedDict['staple'])[1:]
         # Did the init method set the number of bases correctly?
         assert(len(scaf) == len(stap) and len(stap) == self.numBases())
-        for i in range(len(scaf)):
-            self._scaffoldBases[i].setConnectsFromString(scaf[i])
-            self._stapleBases[i].setConnectsFromString(stap[i])
+        # The archive has both ends of every link, so each strand can take
+        # all of its links in one batch
+        for strandType, strings in ((StrandType.Scaffold, scaf),\
+                                    (StrandType.Staple, stap)):
+            strand = self._strand(strandType)
+            fiveTo3 = self.directionOfStrandIs5to3(strandType)
+            links = []
+            for i, string in enumerate(strings):
+                if string == '_,_' and strand.isEmpty(i):
+                    continue
+                link5, link3 = Base.linksFromString(string, self, i, fiveTo3)
+                links.append((i, link5, link3))
+            strand._setLinksAt(links)
@@ -0,0 +1,68 @@
+# The MIT License
+#
+# Copyright (c) 2011 Wyss Institute at Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# http://www.opensource.org/licenses/mit-license.php
+
+
+"""
+tests
+Run from the top of the tree with python -m unittest discover -s tests -t .
+"""
+from PyQt4.QtGui import QUndoStack
+from cadnano import useHeadlessApp
+from model.document import Document
+from model.enum import StrandType
+from model.virtualhelix import VirtualHelix
+
+
+class UndoController(object):
+    """Stands in for the DocumentController that owns the undo stack"""
+    def __init__(self, undoStack=None):
+        if undoStack == None:
+            undoStack = QUndoStack()
+        self._undoStack = undoStack
+        self.isDirty = False
+
+    def undoStack(self):
+        return self._undoStack
+
+    def dirty(self, *args, **kwargs):
+        self.isDirty = True
+
+
+def makePart(numBases, undoStack=None):
+    """Returns a DNAHoneycombPart of numBases bases in a Document of its
+    own, with helices at (0, 0), (0, 1) and (0, 2) whose scaffold and
+    staple strands each run the full length, and the list of the helices"""
+    useHeadlessApp()
+    doc = Document()
+    doc.setController(UndoController(undoStack))
+    part = doc.addDnaHoneycombPart()
+    part.setDimensions((20, 60, numBases))
+    helices = []
+    for coord in ((0, 0), (0, 1), (0, 2)):
+        vh = VirtualHelix()
+        part.setVirtualHelixAt(coord, vh)
+        vh.connectStrand(StrandType.Scaffold, 0, numBases - 1)
+        vh.connectStrand(StrandType.Staple, 0, numBases - 1)
+        helices.append(vh)
+    return part, helices
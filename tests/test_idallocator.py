@@ -0,0 +1,187 @@
+# The MIT License
+#
+# Copyright (c) 2011 Wyss Institute at Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# http://www.opensource.org/licenses/mit-license.php
+
+"""
+test_idallocator.py
+"""
+import random
+import sys
+import time
+import unittest
+from model.idallocator import HelixIDAllocator
+
+
+class ReferenceAllocator(object):
+    """What HelixIDAllocator should do, by brute force"""
+    def __init__(self):
+        self.used = set()
+        self.recycled = set()
+        self.next = [0, 1]
+
+    def reserve(self, parityEven=True, requestedNum=None):
+        if requestedNum != None:
+            num = requestedNum
+        else:
+            parity = 0 if parityEven else 1
+            candidates = [n for n in self.recycled if n % 2 == parity]
+            if candidates:
+                num = min(candidates)
+            else:
+                num = self.next[parity]
+                while num in self.used:
+                    num += 2
+                self.next[parity] = num + 2
+        self.used.add(num)
+        self.recycled.discard(num)
+        return num
+
+    def recycle(self, num):
+        self.used.discard(num)
+        self.recycled.add(num)
+
+    def skipPast(self, num):
+        self.next[num % 2] = max(self.next[num % 2], num + 2)
+
+
+class HelixIDAllocatorTest(unittest.TestCase):
+    def checkAgainstReference(self, seed, numOps, maxNum):
+        rand = random.Random(seed)
+        alloc, ref = HelixIDAllocator(), ReferenceAllocator()
+        for i in xrange(numOps):
+            op = rand.random()
+            if op < 0.4:
+                parityEven = rand.random() < 0.5
+                num = alloc.reserve(parityEven)
+                self.assertEqual(num, ref.reserve(parityEven))
+                self.assertEqual(num % 2, 0 if parityEven else 1)
+            elif op < 0.55:
+                free = [n for n in xrange(maxNum) if n not in ref.used]
+                if free:
+                    num = rand.choice(free)
+                    self.assertEqual(alloc.reserve(num % 2 == 0, num), num)
+                    ref.reserve(num % 2 == 0, num)
+            elif op < 0.95:
+                if ref.used:
+                    num = rand.choice(sorted(ref.used))
+                    alloc.recycle(num)
+                    ref.recycle(num)
+            else:
+                num = rand.randrange(maxNum)
+                alloc.skipPast(num)
+                ref.skipPast(num)
+            self.assertEqual(len(alloc), len(ref.used))
+            for num in xrange(maxNum):
+                self.assertEqual(num in alloc, num in ref.used)
+
+    def testMatchesReference(self):
+        for seed in range(40):
+            self.checkAgainstReference(seed, 300, 60)
+
+    def testMatchesReferenceWithFewNumbers(self):
+        # Reserving by number and recycling keep hitting the same entries
+        for seed in range(40):
+            self.checkAgainstReference(100 + seed, 300, 8)
+
+    def testParityAndUniqueness(self):
+        alloc = HelixIDAllocator()
+        nums = [alloc.reserve(k % 3 != 0) for k in range(1000)]
+        self.assertEqual(len(set(nums)), len(nums))
+        for k, num in enumerate(nums):
+            self.assertEqual(num % 2, 0 if k % 3 != 0 else 1)
+
+    def testRecycledNumbersComeBackLowestFirst(self):
+        alloc = HelixIDAllocator()
+        for k in range(20):
+            alloc.reserve(True)
+        for num in (14, 4, 30):
+            alloc.recycle(num)
+        self.assertEqual([alloc.reserve(True) for k in range(4)],\
+                         [4, 14, 30, 40])
+
+    def testSkipPast(self):
+        alloc = HelixIDAllocator()
+        alloc.skipPast(41)
+        self.assertEqual(alloc.reserve(False), 43)
+        self.assertEqual(alloc.reserve(True), 0)
+        alloc.reserve(True, 2)
+        self.assertEqual(alloc.reserve(True), 4)
+
+    def testUndoRedoCyclesDontGrowTheHeaps(self):
+        # Undoing helix creation recycles its number, redoing reserves it
+        # by number again
+        alloc = HelixIDAllocator()
+        nums = [alloc.reserve(k % 2 == 0) for k in range(200)]
+        for cycle in range(50):
+            for num in nums:
+                alloc.recycle(num)
+            for num in nums:
+                alloc.reserve(num % 2 == 0, num)
+            self.assertTrue(alloc.heapSize() <= len(nums))
+        self.assertEqual(len(alloc), len(nums))
+        self.assertEqual(alloc.reserve(True), 200)
+
+    def testRepeatedRecycleIsIdempotent(self):
+        alloc = HelixIDAllocator()
+        num = alloc.reserve(True)
+        for k in range(10):
+            alloc.recycle(num)
+        self.assertEqual(alloc.heapSize(), 1)
+        self.assertEqual(alloc.reserve(True), num)
+        self.assertEqual(alloc.reserve(True), 2)
+
+
+def benchmark(numIds=100000):
+    """Times the ways a part uses its allocator, at numIds helices"""
+    rand = random.Random(1)
+    alloc = HelixIDAllocator()
+    t = time.time()
+    nums = [alloc.reserve(k % 2 == 0) for k in xrange(numIds)]
+    reserveTime = time.time() - t
+    rand.shuffle(nums)
+    t = time.time()
+    for num in nums:
+        alloc.recycle(num)
+    recycleTime = time.time() - t
+    t = time.time()
+    for num in nums:  # As redo and file loading do
+        alloc.reserve(num % 2 == 0, num)
+    requestTime = time.time() - t
+    t = time.time()
+    for num in nums[:numIds // 2]:
+        alloc.recycle(num)
+    for k in xrange(numIds // 2):
+        alloc.reserve(k % 2 == 0)
+    churnTime = time.time() - t
+    for name, seconds in (('reserve', reserveTime),\
+                          ('recycle', recycleTime),\
+                          ('reserve by number', requestTime),\
+                          ('recycle + reserve half', churnTime)):
+        print '%-24s %8.3f s  %6.2f us/id' % (name, seconds,\
+                                              1e6 * seconds / numIds)
+
+if __name__ == '__main__':
+    if '--benchmark' in sys.argv:
+        benchmark()
+    else:
+        unittest.main()
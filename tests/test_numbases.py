@@ -0,0 +1,131 @@
+# The MIT License
+#
+# Copyright (c) 2011 Wyss Institute at Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# http://www.opensource.org/licenses/mit-license.php
+
+"""
+test_numbases.py
+"""
+import unittest
+from model.enum import StrandType
+from tests import makePart
+
+
+class SetNumBasesTest(unittest.TestCase):
+    """Shrinking and growing a part through DNAPart.setDimensions"""
+    numBases = 42
+
+    def setUp(self):
+        self.part, self.helices = makePart(self.numBases)
+        last = self.numBases - 1
+        for vh in self.helices:
+            vh.clearStrand(StrandType.Staple, 15, 15)
+        st = StrandType.Scaffold
+        # A crossover at the far end, which shrinking has to break...
+        a, b = self.helices[0], self.helices[1]
+        end = last if a.directionOfStrandIs5to3(st) else 0
+        a.installXoverFrom3To5(st, end, b, end)
+        # ...and one at the near end, which it keeps
+        a, b = self.helices[1], self.helices[2]
+        end = last if a.directionOfStrandIs5to3(st) else 0
+        a.installXoverFrom3To5(st, end, b, end)
+        for vh in self.helices:
+            vh.installLoop(StrandType.Scaffold, 5, 1)
+            vh.installLoop(StrandType.Scaffold, 39, 2)
+            vh.installLoop(StrandType.Staple, 30, -1)
+
+    def state(self):
+        ret = []
+        for vh in self.helices:
+            for st in (StrandType.Scaffold, StrandType.Staple):
+                ret.append((vh.number(), st, vh.numBases(),\
+                            [str(b) for b in vh._strand(st)],\
+                            sorted(vh._loop(st).items())))
+        for st in (StrandType.Scaffold, StrandType.Staple):
+            ret.append(sorted(((fromVH.number(), fromIdx),\
+                               (toVH.number(), toIdx)) for\
+                              (fromVH, fromIdx), (toVH, toIdx) in\
+                              self.part.getXovers(st)))
+        return ret
+
+    def setNumBases(self, numBases):
+        self.part.setDimensions((20, 60, numBases))
+
+    def assertWithin(self, numBases):
+        self.assertEqual(self.part.numBases(), numBases)
+        for vh in self.helices:
+            self.assertEqual(vh.numBases(), numBases)
+            for st in (StrandType.Scaffold, StrandType.Staple):
+                for b in vh._strand(st):
+                    for neighbor in (b.get5pBase(), b.get3pBase()):
+                        if neighbor != None:
+                            self.assertTrue(neighbor._n < numBases)
+                for index in vh._loop(st):
+                    self.assertTrue(index < numBases)
+                loops = vh._loop(st)
+                self.assertEqual(loops.nucleotideCount(0, numBases - 1),\
+                                 numBases + sum(loops[i] for i in loops))
+
+    def testShrinkThenGrow(self):
+        undoStack = self.part.undoStack()
+        original = self.state()
+        self.assertEqual(len(self.part.getXovers(StrandType.Scaffold)), 2)
+        self.setNumBases(21)
+        self.assertWithin(21)
+        self.assertEqual(len(self.part.getXovers(StrandType.Scaffold)), 1)
+        shrunk = self.state()
+        self.assertEqual(self.part.getXoversInRange(StrandType.Scaffold,\
+                                                    21, self.numBases), [])
+        self.setNumBases(self.numBases)
+        self.assertWithin(self.numBases)
+        grown = self.state()
+        for vh in self.helices:
+            for st in (StrandType.Scaffold, StrandType.Staple):
+                self.assertTrue(vh._strand(st).isEmptyRange(21,\
+                                                            self.numBases))
+                self.assertFalse(39 in vh._loop(st))  # Stays gone
+        undoStack.undo()
+        self.assertEqual(self.state(), shrunk)
+        undoStack.undo()
+        self.assertEqual(self.state(), original)
+        undoStack.redo()
+        self.assertEqual(self.state(), shrunk)
+        undoStack.redo()
+        self.assertEqual(self.state(), grown)
+
+    def testGrowThenShrink(self):
+        undoStack = self.part.undoStack()
+        original = self.state()
+        self.setNumBases(84)
+        self.assertWithin(84)
+        for vh in self.helices:
+            for st in (StrandType.Scaffold, StrandType.Staple):
+                self.assertTrue(vh._strand(st).isEmptyRange(self.numBases,\
+                                                            84))
+        self.setNumBases(self.numBases)
+        self.assertEqual(self.state(), original)
+        undoStack.undo()
+        undoStack.undo()
+        self.assertEqual(self.state(), original)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+# The MIT License
+#
+# Copyright (c) 2011 Wyss Institute at Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# http://www.opensource.org/licenses/mit-license.php
+
+
+"""
+test_oligoindex.py
+"""
+import random
+import unittest
+from model.enum import StrandType
+from tests import makePart
+
+
+class OligoIdCompactionTest(unittest.TestCase):
+    """The ids that merges and splits leave behind get reclaimed"""
+    numBases = 42
+
+    def setUp(self):
+        self.part, self.helices = makePart(self.numBases)
+        self.index = self.part.oligoIndex()
+        self.index._minIdsToCompact = self.index._compactAt = 16
+
+    def assertConsistent(self):
+        """Every oligo matches a walk along the links"""
+        oligos = set()
+        for vh in self.helices:
+            for st in (StrandType.Scaffold, StrandType.Staple):
+                for b in vh._strand(st):
+                    if b.isEmpty():
+                        self.assertEqual(b.oligo(), None)
+                        continue
+                    first = b
+                    while first.get5pBase() not in (None, b):
+                        first = first.get5pBase()
+                    o = b.oligo()
+                    self.assertNotEqual(o, None)
+                    oligos.add(o)
+                    self.assertTrue(first.oligo() is o)
+                    n, x = 1, first.get3pBase()
+                    while x not in (None, first):
+                        self.assertTrue(x.oligo() is o)
+                        n, x = n + 1, x.get3pBase()
+                    self.assertEqual(o.length(), n)
+        self.assertEqual(len(self.part.getOligos()), len(oligos))
+
+    def testIdsStayBounded(self):
+        random.seed(0)
+        undoStack = self.part.undoStack()
+        peak = mostOligos = 0
+        for step in range(2000):
+            vh = random.choice(self.helices)
+            st = random.choice((StrandType.Scaffold, StrandType.Staple))
+            i = random.randrange(1, self.numBases - 1)
+            if random.random() < .5:
+                vh.clearStrand(st, i, i)
+            else:
+                vh.connectStrand(st, i - 1, i + 1)
+            if random.random() < .4:
+                undoStack.undo()
+            peak = max(peak, len(self.index._parent))
+            mostOligos = max(mostOligos, len(self.part.getOligos()))
+            if step % 100 == 0:
+                self.assertConsistent()
+        self.assertConsistent()
+        self.assertTrue(self.index._valid)
+        # Without compaction this passes 4000
+        self.assertTrue(peak <= 4 * mostOligos + 16, (peak, mostOligos))
+
+if __name__ == '__main__':
+    unittest.main()
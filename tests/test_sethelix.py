@@ -0,0 +1,68 @@
+# The MIT License
+#
+# Copyright (c) 2011 Wyss Institute at Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# http://www.opensource.org/licenses/mit-license.php
+
+
+"""
+test_sethelix.py
+"""
+import unittest
+from tests import makePart
+
+
+class MoveHelixTest(unittest.TestCase):
+    """Setting a helix that the part already holds at new coordinates
+    moves it as a single undo step"""
+
+    def setUp(self):
+        self.part, self.helices = makePart(42)
+        self.undoStack = self.part.undoStack()
+
+    def state(self):
+        part = self.part
+        return sorted((coords, vh.number()) for coords, vh in\
+                      part._coordToVirtualHelix.iteritems()),\
+               sorted(part._numberToVirtualHelix)
+
+    def assertMovesAsOneStep(self, coords):
+        vh = self.helices[0]
+        before, numCommands = self.state(), self.undoStack.count()
+        self.part.setVirtualHelixAt(coords, vh)
+        after = self.state()
+        self.assertEqual(self.undoStack.count(), numCommands + 1)
+        self.assertTrue(self.part.getVirtualHelix(coords) is vh)
+        self.assertEqual(self.part.getVirtualHelix((0, 0)), None)
+        self.undoStack.undo()
+        self.assertEqual(self.state(), before)
+        self.undoStack.redo()
+        self.assertEqual(self.state(), after)
+
+    def testMoveToEmptySlot(self):
+        self.assertMovesAsOneStep((1, 1))
+
+    def testMoveOntoAnotherHelix(self):
+        self.assertMovesAsOneStep((0, 2))
+        self.assertEqual(len(self.part.getVirtualHelices()), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+# The MIT License
+#
+# Copyright (c) 2011 Wyss Institute at Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# http://www.opensource.org/licenses/mit-license.php
+
+
+"""
+test_undohistory.py
+"""
+import gc
+import unittest
+from model.enum import StrandType
+from model.undohistory import UndoHistory
+from tests import makePart
+
+
+class CheckpointBudgetTest(unittest.TestCase):
+    """UndoHistory keeps its checkpoints within maxCheckpointBytes"""
+    numBases = 42
+
+    def setUp(self):
+        part, helices = makePart(self.numBases)
+        self.checkpointSize = part.checkpoint().byteSize()
+
+    def makeHistory(self, **kwargs):
+        """An UndoHistory made with kwargs, for a part like the one setUp
+        measured"""
+        self.history = history = UndoHistory(**kwargs)
+        self.part, self.helices = makePart(self.numBases, history)
+        history.setDocument(self.part.document())
+        history.clear()
+        return history
+
+    def edit(self, i):
+        vh = self.helices[i % len(self.helices)]
+        vh.clearStrand(StrandType.Scaffold, i % 40 + 1, i % 40 + 1)
+
+    def testIntervalHoldsWhileCheckpointsFit(self):
+        budget = 100 * self.checkpointSize
+        history = self.makeHistory(checkpointInterval=10,\
+                                   maxCheckpointBytes=budget)
+        history.addCheckpoint()
+        self.assertEqual(history.checkpointInterval(), 10)
+
+    def testIntervalGrowsWithTheDesign(self):
+        # Only 4 of these checkpoints fit, rather than minRetained
+        history = self.makeHistory(checkpointInterval=10,\
+                                   maxCheckpointBytes=4 * self.checkpointSize)
+        history.addCheckpoint()
+        self.assertEqual(history.checkpointInterval(),\
+                         10 * UndoHistory.minRetainedCheckpoints // 4)
+        for i in range(history.checkpointInterval() - 1):
+            self.edit(i)
+        numCheckpoints = len(history.checkpoints())
+        self.edit(0)
+        self.assertEqual(len(history.checkpoints()), numCheckpoints + 1)
+
+    def testOversizedCheckpointIsNotKept(self):
+        history = self.makeHistory(maxCheckpointBytes=self.checkpointSize - 1)
+        history.addCheckpoint()
+        self.assertEqual(history.checkpoints(), [])
+        self.assertEqual(history.checkpointBytes(), 0)
+
+    def testRestoredStatesCountAgainstTheBudget(self):
+        nbytes = self.checkpointSize
+        history = self.makeHistory(checkpointInterval=0,\
+                                   maxCheckpointBytes=3 * nbytes)
+        for i in range(3):
+            self.edit(i)
+            history.addCheckpoint()
+        self.assertEqual(len(history.checkpoints()), 3)
+        self.edit(3)
+        history.restoreCheckpoint(0)
+        # The state the restore command keeps for undo pushes one out
+        self.assertEqual(len(history.checkpoints()), 2)
+        self.assertTrue(history.checkpointBytes() <= 3 * nbytes)
+        history.undo()
+        history.clear()  # Deletes the restore command
+        gc.collect()
+        self.assertEqual(history.checkpointBytes(), 2 * nbytes)
+
+if __name__ == '__main__':
+    unittest.main()
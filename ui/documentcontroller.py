@@ -27,6 +27,7 @@ from PyQt4.QtCore import SIGNAL, QString, QFileInfo
 from cadnano import app
 from idbank import IdBank
 from model.document import Document
+from model.undohistory import UndoHistory
 from model.encoder import encode
 from .documentwindow import DocumentWindow
 from pathview.pathhelixgroup import PathHelixGroup
@@ -34,7 +35,7 @@ from sliceview.honeycombslicegraphicsitem import HoneycombSliceGraphicsItem
 from treeview.treecontroller import TreeController
 from pathview.handles.activeslicehandle import ActiveSliceHandle
 from model.enum import LatticeType
-from model.decoder import decode
+from model.binaryarchive import load
 
 if app().isInMaya():
     from .mayawindow import DocumentWindow
@@ -48,7 +49,7 @@ class DocumentController():
 
     def __init__(self, doc=None, fname=None):
         app().documentControllers.add(self)
-        self._undoStack = QUndoStack()
+        self._undoStack = UndoHistory()
         self._filename = fname if fname else "untitled.cn2"
         self._hasNoAssociatedFile = fname==None
         self.win = DocumentWindow(docCtrlr=self)
@@ -76,6 +77,7 @@ class DocumentController():
     def setDocument(self, doc):
         self._document = doc
         doc.setController(self)
+        self._undoStack.setDocument(doc)
         doc.partAdded.connect(self.docPartAddedEvent)
         for p in doc.parts():
             self.docPartAddedEvent(p)
@@ -95,6 +97,7 @@ class DocumentController():
         self.win.actionClose.triggered.connect(self.closeClicked)
         self.win.actionSave.triggered.connect(self.saveClicked)
         self.win.actionSVG.triggered.connect(self.svgClicked)
+        self.win.actionAutoStaple.triggered.connect(self.autoStapleClicked)
 
         #self.win.actionSave_As.triggered.connect(self.saveAsClicked)
         # self.win.actionQuit.triggered.connect(self.closeClicked)
@@ -125,7 +128,7 @@ class DocumentController():
     def openClicked(self):
         """docstring for openClicked"""
         fname = QFileDialog.getOpenFileName(None, "Open Document", "/", "caDNAno2 Files (*.cn2);; cadnano Files (*.cadnano)")
-        doc = decode(file(fname).read())
+        doc = load(str(fname))  # Either the JSON or the binary format
         DocumentController(doc, fname)
     # end def
 
@@ -165,6 +168,12 @@ class DocumentController():
         print "svg clicked"
     # end def
 
+    def autoStapleClicked(self):
+        """Staples every part of the document (see DNAPart.autoStaple)"""
+        for part in self._document.parts():
+            part.autoStaple()
+    # end def
+
     def hcombClicked(self):
         """docstring for hcombClicked"""
         self.addHoneycombHelixGroup()
@@ -84,9 +84,10 @@ class PreCrossoverHandle(QGraphicsItem):
         self.toVH = toVH
         self.toIdx = toIdx
         self.orientedLeft = orientedLeft
-        
-        self.fromVH.basesModified.connect(self.updateVisibilityAndEnabledness)
-        self.toVH.basesModified.connect(self.updateVisibilityAndEnabledness)
+        # Refreshed by the parent PathHelix (through setCrossoverState)
+        # whenever the bases at either end change
+        self._couldFormNewCrossover = False
+        self._crossoverExists = False
         
         self.label = QGraphicsSimpleTextItem(str(toVH.number()), parent=self)
         self.label.setFont(self.toHelixNumFont)
@@ -98,27 +99,35 @@ class PreCrossoverHandle(QGraphicsItem):
         labelX = self.baseWidth/2 - halfLabelW
         labelY = (-.10 if self.onTopStrand() else .48) * self.baseWidth
         self.label.setPos(labelX, labelY)
-        self.updateVisibilityAndEnabledness()
     
     def onTopStrand(self):
         return self.fromVH.evenParity() and self.fromStrand==StrandType.Scaffold or\
                not self.fromVH.evenParity() and self.fromStrand==StrandType.Staple
             
     def couldFormNewCrossover(self):
-        return self.fromVH.possibleNewCrossoverAt(self.fromStrand, self.fromIdx, self.toVH, self.toIdx)
+        return self._couldFormNewCrossover
     
     def crossoverExists(self):
-        return self.fromVH.hasCrossoverAt(self.fromStrand, self.fromIdx)
+        return self._crossoverExists
     
     def is3pEndOfCrossover(self):
         return self.orientedLeft and self.onTopStrand() or\
                not self.orientedLeft and not self.onTopStrand
     
     def updateVisibilityAndEnabledness(self):
-        shouldBeVisible = not self.crossoverExists()
+        """Queries the model for this handle alone. PathHelix refreshes
+        all of its handles at once with setCrossoverState instead."""
+        couldForm, exists = self.fromVH.crossoverStatesAt(self.fromStrand,\
+                                        ((self.fromIdx, self.toVH, self.toIdx),))
+        self.setCrossoverState(couldForm[0], exists[0])
+
+    def setCrossoverState(self, couldFormNewCrossover, crossoverExists):
+        self._couldFormNewCrossover = couldFormNewCrossover
+        self._crossoverExists = crossoverExists
+        shouldBeVisible = not crossoverExists
         self.setVisible(shouldBeVisible)
         self.label.setVisible(shouldBeVisible)
-        if self.couldFormNewCrossover():
+        if couldFormNewCrossover:
             self.label.setBrush(self.enabbrush)
         else:
             self.label.setBrush(self.disabbrush)
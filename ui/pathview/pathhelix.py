@@ -98,6 +98,7 @@ class PathHelix(QGraphicsItem):
         self._scafXoverHandles = []
         self._stapXoverHandles = []
         self._preXOverHandles = None
+        self._preXOverSlots = None  # [(vhelix, slot)] while handles are up
         self._segmentPaths = None
         self._loopPaths = None
         self._minorGridPainterPath = None
@@ -180,6 +181,9 @@ class PathHelix(QGraphicsItem):
             for pch in self._preXOverHandles:
                 pch.setParentItem(None)
             self._preXOverHandles = None
+            for vh, slot in self._preXOverSlots:
+                vh.basesModifiedInRange.disconnect(slot)
+            self._preXOverSlots = None
         elif not areVisible and shouldBeVisible:
             self._preXOverHandles = handles = []
             for strandType, facingRight in product((StrandType.Scaffold, StrandType.Staple), (True, False)):
@@ -188,6 +192,32 @@ class PathHelix(QGraphicsItem):
                 for (neighborVH, fromIdx) in potentialXOvers:
                     pch = PreCrossoverHandle(self, strandType, fromIdx, neighborVH, fromIdx, not facingRight)
                     handles.append(pch)
+            # One connection per helix rather than per handle; the slot
+            # needs to know which helix changed
+            self._preXOverSlots = []
+            for vh in set([self.vhelix()] + [pch.toVH for pch in handles]):
+                slot = lambda lo, hi, vh=vh: self.preXOverHelixBasesModified(vh, lo, hi)
+                vh.basesModifiedInRange.connect(slot)
+                self._preXOverSlots.append((vh, slot))
+            self.refreshPreXOverHandles(handles)
+
+    def preXOverHelixBasesModified(self, vh, startIndex, endIndex):
+        stale = [pch for pch in self._preXOverHandles\
+                 if pch.fromVH == vh and startIndex <= pch.fromIdx <= endIndex\
+                 or pch.toVH == vh and startIndex <= pch.toIdx <= endIndex]
+        self.refreshPreXOverHandles(stale)
+
+    def refreshPreXOverHandles(self, handles):
+        """Brings handles up to date with one bulk model query per
+        strand type (see VirtualHelix.crossoverStatesAt)"""
+        for strandType in (StrandType.Scaffold, StrandType.Staple):
+            pchs = [pch for pch in handles if pch.fromStrand == strandType]
+            if not pchs:
+                continue
+            couldForm, exists = self.vhelix().crossoverStatesAt(strandType,\
+                            [(pch.fromIdx, pch.toVH, pch.toIdx) for pch in pchs])
+            for pch, c, e in zip(pchs, couldForm, exists):
+                pch.setCrossoverState(c, e)
     
     def makeSelfActiveHelix(self):
         self._pathHelixGroup.setActiveHelix(self)
@@ -107,7 +107,7 @@ class PathHelixGroup(QGraphicsObject):
         newPart.selectionWillChange.connect(self.selectionWillChange)
         self._part = newPart
         if newPart:
-            self.selectionWillChange(newPart.selection())
+            self.setDisplayedVHs(newPart.selection())
 
     def controller(self):
         return self._controller
@@ -158,16 +158,29 @@ class PathHelixGroup(QGraphicsObject):
     def _set_pathHelixList(self, newList):
         """Give me a list of PathHelix and I'll parent them
         to myself if necessary, position them in a column, adopt
-        their handles, and position them as well."""
+        their handles, and position them as well. The PathHelix
+        at the top that are already in place are left alone."""
         y = 0  # How far down from the top the next PH should be
         leftmostExtent = 0
         rightmostExtent = 0
         self.label().setVisible(True)
-        for ph in self._pathHelixList:
-            if not ph in newList:
+        oldList = self._pathHelixList
+        first = 0  # The first PH that isn't in place already
+        while first < min(len(oldList), len(newList)) and\
+              oldList[first] is newList[first]:
+            first += 1
+        kept = set(newList)
+        for ph in oldList[first:]:
+            if not ph in kept:
                 ph.handle().setParentItem(None)
                 ph.setParentItem(None)
-        for ph in newList:
+        for ph in newList[:first]:
+            ph_height = ph.boundingRect().height()
+            phhr = ph.handle().boundingRect()
+            leftmostExtent = min(leftmostExtent, -2 * phhr.width())
+            rightmostExtent = max(rightmostExtent, ph.boundingRect().width())
+            y += ph_height + styles.PATH_HELIX_PADDING
+        for ph in newList[first:]:
             ph.setParentItem(self)
             ph.setPos(0, y)
             ph_height = ph.boundingRect().height()
@@ -263,8 +276,19 @@ class PathHelixGroup(QGraphicsObject):
         self.setDisplayedVHs(vh)
 
     # Slot called when the slice view's (actually the part's) selection changes
-    def selectionWillChange(self, newSelection):
-        self.setDisplayedVHs(newSelection)
+    def selectionWillChange(self, added, removed):
+        """Drops the PathHelix of the helices leaving the selection and
+        appends one for each helix joining it"""
+        removed = set(removed)
+        newList = [ph for ph in self._pathHelixList\
+                   if not ph.vhelix() in removed]
+        shown = set(ph.vhelix() for ph in newList)
+        for vh in added:
+            if not vh in shown:
+                newList.append(PathHelix(vh, self))
+                shown.add(vh)
+        self._set_pathHelixList(newList)
+        self.displayedVHsChanged.emit()
 
     def getPathHelix(self, vhref):
         """Given the helix number, return a reference to the PathHelix."""
@@ -95,10 +95,14 @@ class HoneycombSliceGraphicsItem(QGraphicsItem):  # was a QGraphicsObject change
         if self._part:
             self._part.dimensionsWillChange.disconnect(self._setDimensions)
             self._part.activeSliceWillChange.disconnect(self.activeSliceWillChange)
+            self._part.virtualHelicesAtCoordsChanged.disconnect(\
+                                            self.virtualHelicesChanged)
         self._setDimensions(newPart.dimensions())
         newPart.dimensionsWillChange.connect(self._setDimensions)
         newPart.selectionWillChange.connect(self.selectionWillChange)
         newPart.activeSliceWillChange.connect(self.activeSliceChanged)
+        newPart.virtualHelicesAtCoordsChanged.connect(\
+                                            self.virtualHelicesChanged)
         self._part = newPart
     
     def upperLeftCornerForCoords(self, row, col):
@@ -165,11 +169,22 @@ class HoneycombSliceGraphicsItem(QGraphicsItem):  # was a QGraphicsObject change
     def paint(self, painter, option, widget=None):
         pass
     
-    def selectionWillChange(self, newSel):
+    def selectionWillChange(self, added, removed):
         if self.part().selectAllBehavior:
             return
-        for sh in self._helixhash.itervalues():
-            sh.setSelected(sh.virtualHelix() in newSel)
+        for vh, select in [(vh, False) for vh in removed] +\
+                          [(vh, True) for vh in added]:
+            sh = self._helixhash.get(vh.coord(), None)
+            if sh != None:
+                sh.setSelected(select)
+
+    def virtualHelicesChanged(self, coordsList):
+        """Repaints the slices whose helices setVirtualHelicesAt
+        changed"""
+        for coords in coordsList:
+            helix = self._helixhash.get(coords, None)
+            if helix != None:
+                helix.update()
 
     def activeSliceChanged(self, newActiveSliceZIndex):
         newlyActiveVHs = set()